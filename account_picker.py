@@ -0,0 +1,130 @@
+"""
+PG Ledger: 계정 수가 많을 때 사용하는 검색형·페이지 단위 계좌 선택기
+
+계정 이름은 메모리 인덱스(AccountIndex)에서 검색하고,
+화면에 표시되는 한 페이지분의 잔고만 단일 쿼리로 조회합니다.
+
+검색 방식
+  - 접두사 검색: 'bank.KRW.wo' → 이름이 해당 문자열로 시작하는 계정
+  - 세그먼트 검색: 'krw woori 84' → '.'으로 나눈 이름 조각들이 순서대로 각 검색어로 시작하는 계정
+"""
+import bisect
+
+DEFAULT_PAGE_SIZE = 20
+
+
+class AccountIndex:
+    """(계정 이름, 계정 ID) 목록에 대한 메모리 검색 인덱스"""
+
+    def __init__(self, accounts):
+        # 대소문자 구분 없는 접두사 검색을 위해 소문자 이름 기준으로 정렬
+        self.entries = sorted(accounts, key=lambda item: item[0].lower())
+        self._keys = [name.lower() for name, _ in self.entries]
+        self._segments = [key.split('.') for key in self._keys]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _prefix_range(self, prefix):
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + '\uffff')
+        return range(lo, hi)
+
+    def _segment_match(self, i, tokens):
+        segments = self._segments[i]
+        pos = 0
+        for token in tokens:
+            while pos < len(segments) and not segments[pos].startswith(token):
+                pos += 1
+            if pos == len(segments):
+                return False
+            pos += 1
+        return True
+
+    def search(self, query):
+        """검색어와 일치하는 (이름, ID) 목록을 이름순으로 반환합니다."""
+        query = query.strip().lower()
+        if not query:
+            return self.entries
+
+        matched = self._prefix_range(query)
+        if matched:
+            return [self.entries[i] for i in matched]
+
+        tokens = [t for t in query.replace('.', ' ').split() if t]
+        return [self.entries[i] for i in range(len(self.entries)) if self._segment_match(i, tokens)]
+
+
+def balance_fetcher(router):
+    """라우터의 읽기 연결로 여러 계정의 잔고를 한 번에 조회하는 함수를 반환합니다."""
+    def fetch_balances(account_ids):
+        if not account_ids:
+            return {}
+        with router.read() as cur:
+            cur.execute(
+                "SELECT id, balance FROM pgledger_accounts_view WHERE id = ANY(%s)",
+                (list(account_ids),)
+            )
+            return dict(cur.fetchall())
+    return fetch_balances
+
+
+def pick_account(index, fetch_balances, title, page_size=DEFAULT_PAGE_SIZE, full_index=None):
+    """
+    검색어와 페이지 이동으로 계좌 하나를 선택받아 (이름, ID)를 반환합니다. 취소 시 None.
+    full_index가 주어지면 '99' 입력으로 해당 인덱스(예: liquidity 포함 전체)로 전환합니다.
+    """
+    query = ''
+    page = 0
+
+    while True:
+        matches = index.search(query)
+        page_count = max(1, (len(matches) + page_size - 1) // page_size)
+        page = min(page, page_count - 1)
+        rows = matches[page * page_size:(page + 1) * page_size]
+        balances = fetch_balances([account_id for _, account_id in rows])
+
+        print(f"\n--- {title} ---")
+        if query:
+            print(f"검색어: '{query}'")
+        print(f"{'번호':<5} {'계정 이름':<30} {'현재 잔고':>18}")
+        print("-" * 58)
+        for i, (name, account_id) in enumerate(rows):
+            balance = balances.get(account_id)
+            balance_str = f"{balance:>18,}" if balance is not None else f"{'-':>18}"
+            print(f"{i + 1:<5} {name:<30} {balance_str}")
+        if not rows:
+            print("  (일치하는 계좌가 없습니다)")
+        print("-" * 58)
+        print(f"총 {len(matches)}개 중 {page + 1}/{page_count} 페이지")
+        print("번호: 선택 | 문자: 검색 (숫자 검색은 /8472) | n/p: 다음/이전 페이지 | *: 검색 초기화 | 0: 취소")
+        if full_index is not None and index is not full_index:
+            print("99. 모든 계좌 보기 (liquidity 포함)")
+
+        choice = input("\n입력: ").strip()
+
+        if choice == '0':
+            return None
+        if choice == '99' and full_index is not None and index is not full_index:
+            index = full_index
+            page = 0
+            continue
+        if choice.lower() == 'n':
+            page = min(page + 1, page_count - 1)
+            continue
+        if choice.lower() == 'p':
+            page = max(page - 1, 0)
+            continue
+        if choice == '*':
+            query = ''
+            page = 0
+            continue
+        if choice.isdigit():
+            number = int(choice)
+            if 1 <= number <= len(rows):
+                return rows[number - 1]
+            print("❗ 잘못된 번호입니다.")
+            continue
+        if choice:
+            query = choice[1:] if choice.startswith('/') else choice
+            page = 0
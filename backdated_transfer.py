@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+PG Ledger: 과거 시점(event_at)으로 거래를 소급 기록하는 스크립트
+
+소급 거래를 해당 시점에 끼워 넣은 뒤, 두 계정에서 그 시점 이후에 기록된 엔트리들의
+account_previous_balance / account_current_balance / account_version 을
+한 번의 set 기반 UPDATE로 보정합니다. (영향받는 계정의 이후 엔트리만 수정)
+"""
+import sys
+from datetime import datetime, timezone, timedelta
+from decimal import Decimal, InvalidOperation
+
+import psycopg
+
+import flow_aggregates
+import profiling
+from account_picker import AccountIndex, balance_fetcher, pick_account
+from db_routing import ConnectionRouter
+
+# 데이터베이스 연결 설정
+DB_CONFIG = {
+    'dbname': 'pgledger',
+    'user': 'pgledger',
+    'password': 'pgledger',
+    'host': 'localhost',
+    'port': 5432
+}
+
+KST = timezone(timedelta(hours=9))
+
+# 소급 엔트리 삽입 + 이후 엔트리 보정 + 계정 잔고 갱신을 한 문장으로 처리
+_POST_SQL = """
+WITH legs (account_id, delta) AS (
+    VALUES (%(from_id)s, -%(amount)s::numeric),
+           (%(to_id)s, %(amount)s::numeric)
+),
+prior AS (
+    -- 소급 시점 직전(같은 시각 포함)의 마지막 엔트리 기준 잔고와 버전
+    SELECT l.account_id, l.delta,
+           COALESCE(p.account_current_balance, 0) AS balance_before,
+           COALESCE(p.account_version, 0) AS version_before
+    FROM legs l
+    LEFT JOIN LATERAL (
+        SELECT e.account_current_balance, e.account_version
+        FROM pgledger_entries e
+        WHERE e.account_id = l.account_id AND e.created_at <= %(event_at)s
+        ORDER BY e.created_at DESC, e.account_version DESC
+        LIMIT 1
+    ) p ON TRUE
+),
+shifted AS (
+    UPDATE pgledger_entries e
+    SET account_previous_balance = e.account_previous_balance + p.delta,
+        account_current_balance = e.account_current_balance + p.delta,
+        account_version = e.account_version + 1
+    FROM prior p
+    WHERE e.account_id = p.account_id AND e.created_at > %(event_at)s
+    RETURNING e.account_id
+),
+inserted AS (
+    INSERT INTO pgledger_entries
+        (account_id, transfer_id, amount, account_previous_balance,
+         account_current_balance, account_version, created_at)
+    SELECT account_id, %(transfer_id)s, delta, balance_before,
+           balance_before + delta, version_before + 1, %(event_at)s
+    FROM prior
+    RETURNING account_id
+),
+updated AS (
+    UPDATE pgledger_accounts a
+    SET balance = a.balance + p.delta,
+        version = a.version + 1,
+        updated_at = now()
+    FROM prior p
+    WHERE a.id = p.account_id
+    RETURNING a.id
+)
+SELECT (SELECT COUNT(*) FROM shifted),
+       (SELECT COUNT(*) FROM inserted),
+       (SELECT COUNT(*) FROM updated)
+"""
+
+# 잔고 부호 제한이 있는 계정에서 보정 후 제한을 벗어난 엔트리가 있는지 확인
+_LIMIT_CHECK_SQL = """
+SELECT a.name
+FROM pgledger_accounts a
+JOIN pgledger_entries e ON e.account_id = a.id
+WHERE a.id = ANY(%(ids)s)
+  AND e.created_at >= %(event_at)s
+  AND ((NOT a.allow_negative_balance AND e.account_current_balance < 0)
+       OR (NOT a.allow_positive_balance AND e.account_current_balance > 0))
+LIMIT 1
+"""
+
+
+def post_backdated_transfer(cur, from_account_id, to_account_id, amount, event_at):
+    """
+    event_at 시점으로 이체를 소급 기록하고, 이후 엔트리의 잔고/버전 체인을 보정합니다.
+    호출자의 트랜잭션 안에서 실행되며 커밋은 호출자가 수행합니다.
+    반환: (transfer_id, 보정된 이후 엔트리 수)
+    """
+    if from_account_id == to_account_id:
+        raise ValueError("출금 계좌와 입금 계좌는 같을 수 없습니다.")
+    if amount <= 0:
+        raise ValueError("금액은 0보다 커야 합니다.")
+    if event_at > datetime.now(timezone.utc):
+        raise ValueError("미래 시각으로는 소급 기록할 수 없습니다.")
+
+    # 두 계정을 ID 순서로 잠가 동시 이체와의 교착을 피함
+    cur.execute(
+        "SELECT id, currency FROM pgledger_accounts WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+        ([from_account_id, to_account_id],)
+    )
+    currencies = dict(cur.fetchall())
+    if len(currencies) != 2:
+        raise ValueError("계정 ID를 찾을 수 없습니다.")
+    if currencies[from_account_id] != currencies[to_account_id]:
+        raise ValueError("통화가 다른 계좌 간에는 소급 이체할 수 없습니다.")
+
+    cur.execute(
+        """
+        INSERT INTO pgledger_transfers
+        (from_account_id, to_account_id, amount, created_at, event_at)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id
+        """,
+        (from_account_id, to_account_id, amount, event_at, event_at)
+    )
+    transfer_id = cur.fetchone()[0]
+
+    params = {
+        'from_id': from_account_id,
+        'to_id': to_account_id,
+        'amount': amount,
+        'event_at': event_at,
+        'transfer_id': transfer_id,
+    }
+    cur.execute(_POST_SQL, params)
+    repaired, _, _ = cur.fetchone()
+
+    cur.execute(_LIMIT_CHECK_SQL, {'ids': [from_account_id, to_account_id], 'event_at': event_at})
+    violated = cur.fetchone()
+    if violated:
+        raise ValueError(f"소급 기록 후 계정 '{violated[0]}'의 잔고가 허용 범위를 벗어납니다.")
+
+    flow_aggregates.apply_transfers(cur, [transfer_id])
+    return transfer_id, repaired
+
+
+def parse_event_at(date_str, time_str="02:00"):
+    """'YYYY-MM-DD'와 'HH:MM'을 KST 기준 timestamptz로 변환합니다."""
+    return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M").replace(tzinfo=KST)
+
+
+@profiling.profiled("backdated_transfer")
+def record_backdated_transfer(from_account_id, to_account_id, amount, event_at):
+    """소급 이체를 하나의 트랜잭션으로 기록하고 커밋합니다."""
+    conn = None
+    try:
+        conn = profiling.connect(**DB_CONFIG)
+        conn.autocommit = False
+        cur = conn.cursor()
+
+        # 월별 흐름 집계도 함께 보정되므로 집계 테이블이 없으면 생성
+        flow_aggregates.ensure_schema(cur)
+        transfer_id, repaired = post_backdated_transfer(cur, from_account_id, to_account_id, amount, event_at)
+        conn.commit()
+        print(f"\n🎉 성공: 소급 거래 기록 완료 [Transfer ID: {transfer_id}]")
+        print(f"   - 이벤트 시각: {event_at.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        print(f"   - 이후 엔트리 {repaired}건의 잔고/버전 보정")
+        return True
+
+    except psycopg.Error as e:
+        if conn:
+            conn.rollback()
+        print(f"\n❌ 데이터베이스 오류 (롤백됨): {e}")
+        return False
+    except ValueError as e:
+        if conn:
+            conn.rollback()
+        print(f"\n❌ 오류 (롤백됨): {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def main():
+    print("\n" + "="*60)
+    print("      소급 거래 기록 스크립트")
+    print("="*60)
+
+    try:
+        router = ConnectionRouter.from_env(DB_CONFIG)
+    except psycopg.OperationalError as e:
+        print(f"\nFATAL: 데이터베이스 연결 실패. DB 설정({DB_CONFIG['dbname']}@{DB_CONFIG['host']})을 확인하세요.")
+        print(f"에러: {e}")
+        sys.exit(1)
+
+    try:
+        with router.read() as cur:
+            cur.execute("SELECT name, id FROM pgledger_accounts_view ORDER BY name")
+            index = AccountIndex(cur.fetchall())
+        fetch_balances = balance_fetcher(router)
+
+        picked_from = pick_account(index, fetch_balances, "출금 계좌 선택")
+        if picked_from is None:
+            return
+        picked_to = pick_account(index, fetch_balances, "입금 계좌 선택")
+        if picked_to is None:
+            return
+    finally:
+        router.close()
+
+    try:
+        amount = Decimal(input("금액 입력: ").strip())
+        event_at = parse_event_at(
+            input("거래 날짜 입력 (예: 2025-10-01): ").strip(),
+            input("거래 시각 입력 (예: 14:30, 엔터 시 02:00): ").strip() or "02:00",
+        )
+    except (InvalidOperation, ValueError):
+        print("❌ 금액 또는 날짜/시각 형식이 올바르지 않습니다.")
+        sys.exit(1)
+
+    print("="*60)
+    print(f"  - 출금: {picked_from[0]}")
+    print(f"  - 입금: {picked_to[0]}")
+    print(f"  - 금액: {amount}")
+    print(f"  - 시각: {event_at:%Y-%m-%d %H:%M} +09")
+    print("="*60)
+    if input("\n진행하시겠습니까? (yes/y): ").strip().lower() not in ['yes', 'y']:
+        print("\n❌ 작업이 취소되었습니다.")
+        return
+
+    if not record_backdated_transfer(picked_from[1], picked_to[1], amount, event_at):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n👋 사용자가 종료했습니다.")
+        sys.exit(0)
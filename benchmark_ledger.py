@@ -0,0 +1,277 @@
+"""
+PG Ledger: 장부 규모별 벤치마크
+
+synthetic_ledger.py 로 규모 단계(tier)별 합성 장부를 생성한 뒤 다음 흐름의 소요 시간을 측정합니다.
+  - load_accounts           : StockLedger.load_accounts()
+  - show_all_accounts       : StockLedger.show_all_accounts() (출력은 버림)
+  - record_transaction      : 같은 통화 bank 계좌 간 이체 처리량
+  - group_commit            : GroupCommitWriter 를 통한 동시 이체 처리량
+  - opening_balance         : set_initial_balance.update_account_balance_direct()
+  - delete_pair             : delete_account_pair.delete_account_pair()
+
+결과는 bench_results/<시각>_<tier>.json 으로 저장되며, --compare 로 두 결과를 비교할 수 있습니다.
+
+⚠️ 대상 데이터베이스의 장부를 모두 지우고 다시 생성합니다. 벤치마크 전용 DB에만 사용하세요.
+
+    python benchmark_ledger.py --tier small --tier medium --yes
+    python benchmark_ledger.py --compare bench_results/a.json bench_results/b.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg
+
+import db_routing
+import delete_account_pair
+import main1
+import set_initial_balance
+import synthetic_ledger
+from group_commit import GroupCommitWriter
+
+RESULTS_DIR = "bench_results"
+
+# tier: (계좌 pair 수, 이체 수) — 엔트리 수는 이체 수의 2배
+TIERS = {
+    'small': (1_000, 100_000),
+    'medium': (10_000, 2_000_000),
+    'large': (100_000, 25_000_000),
+}
+
+TRANSFER_COUNT = 500
+GROUP_COMMIT_THREADS = 8
+ADMIN_OPERATIONS = 5
+
+
+def _summary(samples, ops=None):
+    """소요 시간 표본(초)의 요약 통계"""
+    ordered = sorted(samples)
+    result = {
+        'runs': len(ordered),
+        'min': ordered[0],
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'mean': statistics.fmean(ordered),
+    }
+    if ops is not None:
+        result['ops_per_sec'] = ops / sum(ordered)
+    return result
+
+
+def _timed(func, *args, **kwargs):
+    """출력을 버리고 func 실행 시간을 측정합니다."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        return time.perf_counter() - started
+
+
+def _use_database(config):
+    """각 스크립트의 DB 설정을 벤치마크 DB로 바꿉니다."""
+    for module in (main1, delete_account_pair, set_initial_balance):
+        module.DB_CONFIG.clear()
+        module.DB_CONFIG.update(config)
+    db_routing.close_shared_routers()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _same_currency_pairs(rng, accounts, count):
+    """같은 통화의 서로 다른 bank 계좌 (출금, 입금) ID 쌍을 무작위로 고릅니다."""
+    by_currency = {}
+    for name, account_id in accounts.items():
+        if name.startswith('bank.'):
+            by_currency.setdefault(name.split('.')[1], []).append(account_id)
+    groups = [ids for ids in by_currency.values() if len(ids) >= 2]
+    return [tuple(rng.sample(rng.choice(groups), 2)) for _ in range(count)]
+
+
+def bench_listing(ledger, repeat):
+    return {
+        'load_accounts': _summary([_timed(ledger.load_accounts) for _ in range(repeat)]),
+        'show_all_accounts': _summary([_timed(ledger.show_all_accounts) for _ in range(repeat)]),
+    }
+
+
+def bench_transfers(ledger, rng):
+    pairs = _same_currency_pairs(rng, ledger.accounts, TRANSFER_COUNT)
+    samples = [_timed(ledger.record_transaction, src, dst, Decimal(1)) for src, dst in pairs]
+    return _summary(samples, ops=len(samples))
+
+
+def bench_group_commit(config, accounts, rng):
+    pairs = _same_currency_pairs(rng, accounts, TRANSFER_COUNT)
+    chunks = [pairs[i::GROUP_COMMIT_THREADS] for i in range(GROUP_COMMIT_THREADS)]
+
+    with GroupCommitWriter(config) as writer:
+        def produce(chunk):
+            for src, dst in chunk:
+                writer.submit(src, dst, Decimal(1)).result()
+
+        threads = [threading.Thread(target=produce, args=(chunk,)) for chunk in chunks]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    return _summary([elapsed], ops=len(pairs))
+
+
+def bench_admin(config):
+    """거래가 없는 bank 계좌에 초기 잔고를 넣은 뒤, 그 계좌 pair들을 삭제합니다."""
+    conn = psycopg.connect(**config)
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT name FROM pgledger_accounts WHERE name LIKE 'bank.%%' AND balance = 0 ORDER BY name LIMIT %s",
+            (ADMIN_OPERATIONS,)
+        )
+        names = [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+    if not names:
+        return {}
+    opening = [_timed(set_initial_balance.update_account_balance_direct, name, 1_000_000, "2020-01-01")
+               for name in names]
+    deletion = [_timed(delete_account_pair.delete_account_pair, name, 'bank') for name in names]
+    return {
+        'opening_balance': _summary(opening),
+        'delete_pair': _summary(deletion),
+    }
+
+
+def run_tier(tier, config, seed, repeat):
+    n_pairs, n_transfers = TIERS[tier]
+    print(f"\n=== tier '{tier}': pair {n_pairs:,}개, 이체 {n_transfers:,}건 ===")
+
+    conn = psycopg.connect(**config)
+    try:
+        print("⏳ 합성 장부 생성 중...")
+        generation = synthetic_ledger.generate(conn, n_pairs, n_transfers, seed)
+    finally:
+        conn.close()
+
+    _use_database(config)
+    rng = random.Random(seed)
+    results = {}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ledger = main1.StockLedger()
+    try:
+        print("⏳ 계정 조회 측정 중...")
+        results.update(bench_listing(ledger, repeat))
+        print("⏳ 이체 처리량 측정 중...")
+        results['record_transaction'] = bench_transfers(ledger, rng)
+    finally:
+        ledger.close()
+
+    print("⏳ group-commit 처리량 측정 중...")
+    results['group_commit'] = bench_group_commit(config, ledger.accounts, rng)
+    print("⏳ 관리자 스크립트 측정 중...")
+    results.update(bench_admin(config))
+
+    return {
+        'tier': tier,
+        'pairs': n_pairs,
+        'transfers': n_transfers,
+        'seed': seed,
+        'repeat': repeat,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'generation_seconds': generation,
+        'results': results,
+    }
+
+
+def save_report(report):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{report['tier']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def print_report(report):
+    print(f"\n{'항목':<20} {'median(ms)':>12} {'p95(ms)':>12} {'ops/s':>10}")
+    print("-" * 58)
+    for name, stats in report['results'].items():
+        ops = f"{stats['ops_per_sec']:>10,.1f}" if 'ops_per_sec' in stats else f"{'':>10}"
+        print(f"{name:<20} {stats['median'] * 1000:>12.2f} {stats['p95'] * 1000:>12.2f} {ops}")
+
+
+def compare_reports(old_path, new_path):
+    """두 결과 파일의 항목별 median 을 비교합니다. (비율 < 1 이면 빨라짐)"""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    if (old['tier'], old['seed']) != (new['tier'], new['seed']):
+        print(f"⚠️ tier/seed가 다릅니다: {old['tier']}/{old['seed']} vs {new['tier']}/{new['seed']}")
+
+    print(f"\n{old_path} ({old['git_revision']})  →  {new_path} ({new['git_revision']})")
+    print(f"{'항목':<20} {'이전(ms)':>12} {'이후(ms)':>12} {'비율':>8}")
+    print("-" * 56)
+    for name, stats in new['results'].items():
+        if name not in old['results']:
+            continue
+        before = old['results'][name]['median'] * 1000
+        after = stats['median'] * 1000
+        print(f"{name:<20} {before:>12.2f} {after:>12.2f} {after / before:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="장부 규모별 벤치마크")
+    parser.add_argument("--tier", action="append", choices=list(TIERS), help="측정할 규모 (여러 번 지정 가능)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="조회 측정 반복 횟수")
+    parser.add_argument("--dbname", default=synthetic_ledger.BENCH_DB_CONFIG['dbname'])
+    parser.add_argument("--yes", action="store_true", help="대상 DB의 기존 장부 삭제에 동의")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="두 결과 파일 비교")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    if not args.yes:
+        print(f"⚠️ '{args.dbname}' 데이터베이스의 장부가 모두 삭제됩니다. 계속하려면 --yes 를 지정하세요.")
+        sys.exit(1)
+
+    config = dict(synthetic_ledger.BENCH_DB_CONFIG, dbname=args.dbname)
+    try:
+        for tier in args.tier or ['small']:
+            report = run_tier(tier, config, args.seed, args.repeat)
+            print_report(report)
+            print(f"\n✅ 결과 저장: {save_report(report)}")
+    except psycopg.OperationalError as e:
+        print(f"\nFATAL: 데이터베이스 연결 실패. DB 설정({config['dbname']}@{config['host']})을 확인하세요.")
+        print(f"에러: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
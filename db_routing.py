@@ -0,0 +1,193 @@
+"""
+PG Ledger: 읽기/쓰기 연결 라우팅
+
+쓰기는 항상 primary 연결(autocommit 꺼짐)에서 수행하고,
+목록 조회·리포트 같은 읽기 전용 쿼리는 replica 연결(autocommit)에서
+짧은 READ ONLY 트랜잭션으로 수행합니다.
+replica가 설정되지 않았거나, 지연(lag)이 임계값을 넘었거나, 직전 쓰기를 아직 반영하지 못했거나,
+접속할 수 없으면 primary의 별도 읽기 전용 연결로 대체합니다.
+
+replica는 primary를 스트리밍 복제하는 스탠바이여야 하며, 환경 변수로 지정합니다.
+(예: 로컬에 primary와 pg_basebackup 으로 만든 스탠바이 두 인스턴스를 띄워 테스트)
+    PGLEDGER_REPLICA_DSN="host=localhost port=5433 dbname=pgledger user=pgledger password=pgledger"
+    PGLEDGER_REPLICA_MAX_LAG_BYTES=1048576
+스탠바이가 아닌 인스턴스(pg_is_in_recovery() = false)는 쓰기를 받지 않으므로 replica로 사용하지 않습니다.
+
+primary 쓰기 연결은 처음 사용할 때 생성하므로, 읽기만 하는 스크립트는 쓰기 연결을 열지 않습니다.
+"""
+import atexit
+import os
+import time
+from contextlib import contextmanager
+
+import psycopg
+
+import profiling
+
+DEFAULT_MAX_LAG_BYTES = 1024 * 1024
+DEFAULT_LAG_CHECK_INTERVAL = 1.0
+
+
+def replica_config_from_env():
+    """환경 변수에서 replica 접속 설정을 읽습니다. 설정되지 않았으면 None."""
+    dsn = os.environ.get("PGLEDGER_REPLICA_DSN")
+    if not dsn:
+        return None
+    return {'conninfo': dsn}
+
+
+def max_lag_bytes_from_env():
+    """환경 변수에서 허용 replica 지연(바이트)을 읽습니다."""
+    try:
+        return int(os.environ.get("PGLEDGER_REPLICA_MAX_LAG_BYTES", DEFAULT_MAX_LAG_BYTES))
+    except ValueError:
+        return DEFAULT_MAX_LAG_BYTES
+
+
+class ConnectionRouter:
+    """primary(쓰기)와 replica(읽기) 연결을 관리하고 읽기 쿼리를 라우팅합니다."""
+
+    def __init__(self, primary_config, replica_config=None,
+                 max_lag_bytes=DEFAULT_MAX_LAG_BYTES,
+                 lag_check_interval=DEFAULT_LAG_CHECK_INTERVAL):
+        self.primary_config = primary_config
+        self.replica_config = replica_config
+        self.max_lag_bytes = max_lag_bytes
+        self.lag_check_interval = lag_check_interval
+
+        self._primary = None
+        self._primary_read = None
+        self._replica = None
+        # 읽기가 반드시 반영해야 하는 마지막 쓰기의 WAL 위치
+        self._min_lsn = None
+        self._checked_at = 0.0
+        self._use_replica = False
+        self._warned_not_standby = False
+
+    @classmethod
+    def from_env(cls, primary_config):
+        """환경 변수의 replica 설정으로 라우터를 생성합니다."""
+        return cls(primary_config, replica_config_from_env(), max_lag_bytes_from_env())
+
+    @property
+    def primary(self):
+        """쓰기용 primary 연결 (autocommit 꺼짐, 최초 접근 시 생성)"""
+        if self._primary is None or self._primary.closed:
+            self._primary = profiling.connect(**self.primary_config)
+            self._primary.autocommit = False
+        return self._primary
+
+    def _connect_readonly(self, config):
+        conn = profiling.connect(**config)
+        conn.autocommit = True
+        return conn
+
+    def _get_primary_read(self):
+        if self._primary_read is None or self._primary_read.closed:
+            self._primary_read = self._connect_readonly(self.primary_config)
+        return self._primary_read
+
+    def _get_replica(self):
+        if self._replica is None or self._replica.closed:
+            self._replica = self._connect_readonly(self.replica_config)
+        return self._replica
+
+    def _primary_lsn(self):
+        cur = self._get_primary_read().cursor()
+        cur.execute("SELECT pg_current_wal_lsn()::text")
+        return cur.fetchone()[0]
+
+    def _replica_usable(self):
+        """replica 지연과 직전 쓰기 반영 여부를 확인합니다. (lag_check_interval 동안 결과 재사용)"""
+        if self.replica_config is None:
+            return False
+
+        now = time.monotonic()
+        if now - self._checked_at < self.lag_check_interval:
+            return self._use_replica
+        self._checked_at = now
+
+        try:
+            primary_lsn = self._primary_lsn()
+            cur = self._get_replica().cursor()
+            cur.execute(
+                """
+                SELECT pg_is_in_recovery(),
+                       pg_wal_lsn_diff(%s::pg_lsn, pg_last_wal_replay_lsn()),
+                       pg_wal_lsn_diff(COALESCE(%s::pg_lsn, '0/0'), pg_last_wal_replay_lsn())
+                """,
+                (primary_lsn, self._min_lsn)
+            )
+            in_recovery, lag_bytes, behind_last_write = cur.fetchone()
+            if not in_recovery or lag_bytes is None:
+                # 스탠바이가 아니면 primary의 쓰기를 받지 않으므로 지연을 알 수 없음
+                if not self._warned_not_standby:
+                    print("⚠️ replica가 스탠바이가 아니므로 primary에서 조회합니다.")
+                    self._warned_not_standby = True
+                self._use_replica = False
+            else:
+                self._use_replica = lag_bytes <= self.max_lag_bytes and behind_last_write <= 0
+        except psycopg.Error as e:
+            print(f"⚠️ replica 확인 실패, primary에서 조회합니다: {e}")
+            if self._replica is not None:
+                self._replica.close()
+            self._use_replica = False
+
+        return self._use_replica
+
+    @contextmanager
+    def read(self):
+        """
+        읽기 전용 커서를 제공합니다.
+        블록 전체가 하나의 짧은 REPEATABLE READ, READ ONLY 트랜잭션(단일 스냅샷)으로 실행됩니다.
+        """
+        conn = self._get_replica() if self._replica_usable() else self._get_primary_read()
+        with conn.transaction():
+            cur = conn.cursor()
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            yield cur
+
+    def note_write(self):
+        """
+        primary 커밋 직후 호출합니다.
+        이후의 읽기는 이 커밋을 반영한 replica 또는 primary에서만 수행됩니다.
+        """
+        if self.replica_config is None:
+            return
+        try:
+            self._min_lsn = self._primary_lsn()
+            self._checked_at = 0.0
+        except psycopg.Error:
+            # 커밋 위치를 알 수 없으면 다음 확인 주기까지 primary에서 조회
+            self._use_replica = False
+            self._checked_at = time.monotonic()
+
+    def close(self):
+        for conn in (self._primary, self._primary_read, self._replica):
+            if conn is not None and not conn.closed:
+                conn.close()
+
+
+_shared_routers = {}
+
+
+def shared_router(primary_config):
+    """
+    primary 설정별로 하나씩 만들어 재사용하는 라우터를 반환합니다. (최초 호출 시 생성)
+    관리자 스크립트처럼 모듈 함수에서 라우터를 공유할 때 사용하며, 프로세스 종료 시 자동으로 닫힙니다.
+    """
+    key = tuple(sorted(primary_config.items()))
+    router = _shared_routers.get(key)
+    if router is None:
+        router = _shared_routers[key] = ConnectionRouter.from_env(dict(primary_config))
+    return router
+
+
+def close_shared_routers():
+    """shared_router 로 만든 라우터의 연결을 모두 닫습니다."""
+    while _shared_routers:
+        _, router = _shared_routers.popitem()
+        router.close()
+
+
+atexit.register(close_shared_routers)
@@ -4,6 +4,12 @@ PG Ledger: 지정된 계좌와 쌍이 되는 liquidity.* 계좌 및 관련 거
 import psycopg
 import sys
 
+import flow_aggregates
+import ledger_snapshot
+import profiling
+from account_picker import AccountIndex, balance_fetcher, pick_account
+from db_routing import shared_router
+
 # 데이터베이스 연결 설정
 DB_CONFIG = {
     'dbname': 'pgledger',
@@ -25,25 +31,21 @@ def get_account_id(cur, account_name):
     return None
 
 def get_accounts_by_prefix(prefix):
-    """특정 접두사로 시작하는 계정 목록을 조회합니다."""
-    conn = None
+    """특정 접두사로 시작하는 계정의 (이름, ID) 목록을 조회합니다."""
     try:
-        conn = psycopg.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT name, balance 
-            FROM pgledger_accounts_view 
-            WHERE name LIKE %s
-            ORDER BY name
-        """, (f"{prefix}.%",))
-        return cur.fetchall()
+        with shared_router(DB_CONFIG).read() as cur:
+            cur.execute("""
+                SELECT name, id 
+                FROM pgledger_accounts_view 
+                WHERE name LIKE %s
+                ORDER BY name
+            """, (f"{prefix}.%",))
+            return cur.fetchall()
     except psycopg.Error as e:
         print(f"❌ 데이터베이스 오류 발생: 계좌 목록을 불러올 수 없습니다. {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled("purge")
 def delete_account_pair(account_name, prefix):
     """
     지정된 계좌와 liquidity 쌍 계좌 및 관련 거래를 삭제합니다.
@@ -51,7 +53,7 @@ def delete_account_pair(account_name, prefix):
     """
     conn = None
     try:
-        conn = psycopg.connect(**DB_CONFIG)
+        conn = profiling.connect(**DB_CONFIG)
         conn.autocommit = False
         cur = conn.cursor()
 
@@ -101,6 +103,10 @@ def delete_account_pair(account_name, prefix):
         
         # Transfers 삭제
         if transfer_ids:
+            # 삭제될 거래를 월별 흐름 집계에서 차감 (계정 이름이 남아 있는 동안 수행)
+            flow_aggregates.ensure_schema(cur)
+            flow_aggregates.apply_transfers(cur, transfer_ids, sign=-1)
+
             cur.execute(
                 """
                 DELETE FROM pgledger_transfers 
@@ -126,6 +132,7 @@ def delete_account_pair(account_name, prefix):
 
         # 4. 커밋 및 완료
         conn.commit()
+        shared_router(DB_CONFIG).note_write()
         print("\n🎉 성공: 계좌 쌍 및 모든 관련 거래가 완전히 삭제되었습니다. (DB 커밋 완료)")
         return True
 
@@ -141,6 +148,7 @@ def delete_account_pair(account_name, prefix):
         if conn:
             conn.close()
 
+@profiling.profiled("purge")
 def select_and_delete_account(prefix, account_type_name):
     """계정을 선택하고 삭제하는 프로세스를 처리합니다."""
     accounts_info = get_accounts_by_prefix(prefix)
@@ -150,25 +158,14 @@ def select_and_delete_account(prefix, account_type_name):
         input("\n아무 키나 눌러 메인 메뉴로 돌아가기...")
         return
         
-    print(f"\n--- {account_type_name} 계좌 목록 ---")
-    account_map = {}
-    for i, (name, balance) in enumerate(accounts_info):
-        account_map[str(i + 1)] = name
-        print(f"{i+1}. {name} (현재 잔고: {balance})")
-    print("0. 메인 메뉴로 돌아가기")
-        
-    account_name_to_delete = None
-    while True:
-        choice = input(f"\n삭제할 계좌 번호 선택: ").strip()
-        
-        if choice == '0':
-            return
-            
-        if choice in account_map:
-            account_name_to_delete = account_map[choice]
-            break
-        else:
-            print("❗ 잘못된 번호입니다. 목록 내의 번호를 선택해 주세요.")
+    picked = pick_account(
+        AccountIndex(accounts_info),
+        balance_fetcher(shared_router(DB_CONFIG)),
+        f"{account_type_name} 계좌 목록 (삭제할 계좌 선택, 0: 메인 메뉴로 돌아가기)",
+    )
+    if picked is None:
+        return
+    account_name_to_delete = picked[0]
 
     # 최종 확인
     print(f"\n{'='*70}")
@@ -179,6 +176,11 @@ def select_and_delete_account(prefix, account_type_name):
     confirm = input("정말로 삭제를 진행하시겠습니까? (yes/y): ").strip().lower()
 
     if confirm == 'yes' or confirm == 'y':
+        if input("삭제 전에 장부 스냅샷을 저장하시겠습니까? (y/N): ").strip().lower() in ['yes', 'y']:
+            if ledger_snapshot.snapshot_before("purge", DB_CONFIG) is None:
+                print("\n❌ 스냅샷 저장에 실패하여 삭제 작업을 취소합니다.")
+                input("\n아무 키나 눌러 메인 메뉴로 돌아가기...")
+                return
         delete_account_pair(account_name_to_delete, prefix)
     else:
         print("\n❌ 삭제 작업이 취소되었습니다.")
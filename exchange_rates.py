@@ -0,0 +1,165 @@
+"""
+PG Ledger: write_exchange_json.py 가 수집한 환율을 날짜별로 조회하는 유틸리티
+
+환율은 JSON 파일(exchange_rates.json)과 데이터베이스 테이블(ledger_exchange_rates) 양쪽에 보관됩니다.
+데이터베이스에서는 ledger_rates_as_of(date) 함수로 기준일 시점의 통화별 환율을 조회할 수 있어
+잔고와 환율을 SQL 안에서 바로 결합할 수 있습니다.
+
+    SELECT a.name, a.balance * r.krw_per_unit
+    FROM pgledger_accounts_view a
+    JOIN ledger_rates_as_of(CURRENT_DATE) r USING (currency);
+"""
+import bisect
+import json
+import os
+from datetime import datetime
+
+RATES_FILENAME = "exchange_rates.json"
+
+# 원화 기준 통화 (환율 = 1)
+BASE_CURRENCY = 'KRW'
+
+# SMBS 매매기준율의 고시 단위 (JPY는 100엔당 원화로 고시됨)
+RATE_UNITS = {
+    'JPY': 100,
+}
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ledger_exchange_rates (
+    currency   text        NOT NULL,
+    rate_date  date        NOT NULL,
+    rate       numeric     NOT NULL,
+    unit       integer     NOT NULL DEFAULT 1,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (currency, rate_date)
+);
+
+CREATE OR REPLACE FUNCTION ledger_rates_as_of(as_of_param date)
+RETURNS TABLE (currency text, rate_date date, krw_per_unit numeric)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT 'KRW'::text, as_of_param, 1::numeric
+    UNION ALL
+    SELECT c.currency, r.rate_date, r.rate / r.unit
+    FROM (SELECT DISTINCT e.currency FROM ledger_exchange_rates e) c
+    CROSS JOIN LATERAL (
+        SELECT e.rate_date, e.rate, e.unit
+        FROM ledger_exchange_rates e
+        WHERE e.currency = c.currency AND e.rate_date <= as_of_param
+        ORDER BY e.rate_date DESC
+        LIMIT 1
+    ) r
+$$;
+"""
+
+_UPSERT_SQL = """
+INSERT INTO ledger_exchange_rates AS r (currency, rate_date, rate, unit)
+SELECT DISTINCT ON (currency, rate_date) currency, rate_date, rate, unit
+FROM tmp_exchange_rates
+ORDER BY currency, rate_date
+ON CONFLICT (currency, rate_date) DO UPDATE SET
+    rate = EXCLUDED.rate,
+    unit = EXCLUDED.unit,
+    updated_at = now()
+WHERE (r.rate, r.unit) IS DISTINCT FROM (EXCLUDED.rate, EXCLUDED.unit)
+"""
+
+
+def parse_rate_date(date_str):
+    """'25-10-01' 또는 '2025-10-01' 형식의 날짜 문자열을 date로 변환합니다."""
+    for fmt in ("%y-%m-%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"알 수 없는 날짜 형식입니다: {date_str}")
+
+
+def load_exchange_rates(filename=RATES_FILENAME):
+    """
+    환율 JSON 파일을 읽어 {통화: [(date, 1단위당 원화), ...]} 형태로 반환합니다.
+    날짜 오름차순으로 정렬되며, 고시 단위(JPY 100엔 등)는 1단위 기준으로 환산됩니다.
+    """
+    if not os.path.exists(filename):
+        return {}
+
+    with open(filename, "r", encoding="utf-8") as f:
+        try:
+            raw = json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    rates = {}
+    for currency, records in raw.items():
+        unit = RATE_UNITS.get(currency, 1)
+        series = {}
+        for record in records:
+            try:
+                series[parse_rate_date(record["date"])] = float(record["rate"]) / unit
+            except (KeyError, ValueError, TypeError):
+                continue
+        rates[currency] = sorted(series.items())
+    return rates
+
+
+def quote_as_of(rates, currency, on_date):
+    """
+    on_date 당일 또는 그 이전 가장 최근 고시를 (고시일, 1단위당 원화)로 반환합니다.
+    원화는 (on_date, 1.0), 해당 날짜 이전 고시가 없으면 None을 반환합니다.
+    """
+    if currency == BASE_CURRENCY:
+        return on_date, 1.0
+
+    series = rates.get(currency)
+    if not series:
+        return None
+
+    idx = bisect.bisect_right(series, (on_date, float('inf'))) - 1
+    if idx < 0:
+        return None
+    return series[idx]
+
+
+def rate_as_of(rates, currency, on_date):
+    """
+    on_date 당일 또는 그 이전 가장 최근 고시 환율(1단위당 원화)을 반환합니다.
+    원화는 항상 1, 해당 날짜 이전 고시가 없으면 None을 반환합니다.
+    """
+    quote = quote_as_of(rates, currency, on_date)
+    return quote[1] if quote else None
+
+
+def ensure_schema(cur):
+    """환율 테이블과 기준일 환율 조회 함수를 생성/갱신합니다. (커밋은 호출자가 수행)"""
+    cur.execute(SCHEMA_SQL)
+
+
+def upsert_rates(conn, data):
+    """
+    {통화: [{"date": ..., "rate": ...}, ...]} 형태의 환율을 COPY와 ON CONFLICT로 일괄 반영합니다.
+    고시 단위는 RATE_UNITS 기준으로 함께 저장합니다. 반환: 추가/변경된 행 수
+    """
+    cur = conn.cursor()
+    try:
+        ensure_schema(cur)
+        cur.execute("""
+            CREATE TEMP TABLE tmp_exchange_rates
+                (currency text, rate_date date, rate numeric, unit integer)
+            ON COMMIT DROP
+        """)
+        with cur.copy("COPY tmp_exchange_rates (currency, rate_date, rate, unit) FROM STDIN") as copy:
+            for currency, records in data.items():
+                unit = RATE_UNITS.get(currency, 1)
+                for record in records:
+                    try:
+                        copy.write_row((currency, parse_rate_date(record["date"]), record["rate"], unit))
+                    except (KeyError, ValueError, TypeError):
+                        continue
+        cur.execute(_UPSERT_SQL)
+        changed = cur.rowcount
+        conn.commit()
+        return changed
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,222 @@
+"""
+PG Ledger: 월별 입출금 흐름 집계 테이블 관리
+
+계정별(ledger_monthly_account_flows) 및 계정 이름 접두사별(ledger_monthly_prefix_flows)
+월간 유입/유출 합계를 유지합니다. 접두사 수준은 'bank.KRW.woori.8472' 기준으로
+group('bank'), currency('bank.KRW'), institution('bank.KRW.woori') 세 가지이며,
+같은 접두사 안에서 일어난 내부 이체는 해당 접두사의 유입/유출에 포함되지 않습니다.
+
+거래를 기록하는 쪽(record_transaction, 초기 잔고 스크립트 등)은 같은 트랜잭션 안에서
+apply_transfers()를 호출하여 집계를 갱신하고, 기존 데이터는 backfill()로 한 번에 채웁니다.
+"""
+import sys
+
+import psycopg
+
+# 데이터베이스 연결 설정
+DB_CONFIG = {
+    'dbname': 'pgledger',
+    'user': 'pgledger',
+    'password': 'pgledger',
+    'host': 'localhost',
+    'port': 5432
+}
+
+PREFIX_LEVELS = ('group', 'currency', 'institution')
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ledger_monthly_account_flows (
+    month         date    NOT NULL,
+    account_id    text    NOT NULL,
+    inflow        numeric NOT NULL DEFAULT 0,
+    outflow       numeric NOT NULL DEFAULT 0,
+    inflow_count  bigint  NOT NULL DEFAULT 0,
+    outflow_count bigint  NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, account_id)
+);
+
+CREATE TABLE IF NOT EXISTS ledger_monthly_prefix_flows (
+    level         text    NOT NULL,
+    prefix        text    NOT NULL,
+    month         date    NOT NULL,
+    inflow        numeric NOT NULL DEFAULT 0,
+    outflow       numeric NOT NULL DEFAULT 0,
+    inflow_count  bigint  NOT NULL DEFAULT 0,
+    outflow_count bigint  NOT NULL DEFAULT 0,
+    PRIMARY KEY (level, prefix, month)
+);
+"""
+
+# 대상 거래: {filter}에 조건을 넣어 사용 (전체 backfill 시 TRUE)
+_TRANSFERS_CTE = """
+WITH moved AS (
+    SELECT date_trunc('month', COALESCE(t.event_at, t.created_at) AT TIME ZONE 'Asia/Seoul')::date AS month,
+           t.from_account_id,
+           t.to_account_id,
+           fa.name AS from_name,
+           ta.name AS to_name,
+           t.amount
+    FROM pgledger_transfers t
+    JOIN pgledger_accounts fa ON fa.id = t.from_account_id
+    JOIN pgledger_accounts ta ON ta.id = t.to_account_id
+    WHERE {filter}
+)
+"""
+
+_ACCOUNT_FLOWS_SQL = _TRANSFERS_CTE + """
+INSERT INTO ledger_monthly_account_flows AS f
+    (month, account_id, inflow, outflow, inflow_count, outflow_count)
+SELECT month, account_id,
+       SUM(inflow) * %(sign)s, SUM(outflow) * %(sign)s,
+       SUM(inflow_count) * %(sign)s, SUM(outflow_count) * %(sign)s
+FROM (
+    SELECT month, to_account_id AS account_id,
+           amount AS inflow, 0 AS outflow, 1 AS inflow_count, 0 AS outflow_count
+    FROM moved
+    UNION ALL
+    SELECT month, from_account_id,
+           0, amount, 0, 1
+    FROM moved
+) s
+GROUP BY month, account_id
+ON CONFLICT (month, account_id) DO UPDATE SET
+    inflow = f.inflow + EXCLUDED.inflow,
+    outflow = f.outflow + EXCLUDED.outflow,
+    inflow_count = f.inflow_count + EXCLUDED.inflow_count,
+    outflow_count = f.outflow_count + EXCLUDED.outflow_count
+"""
+
+_PREFIX_FLOWS_SQL = _TRANSFERS_CTE + """
+, crossed AS (
+    SELECT m.month, lv.level, lv.from_prefix, lv.to_prefix, m.amount
+    FROM moved m
+    CROSS JOIN LATERAL (VALUES
+        ('group',
+         split_part(m.from_name, '.', 1),
+         split_part(m.to_name, '.', 1)),
+        ('currency',
+         array_to_string((string_to_array(m.from_name, '.'))[1:2], '.'),
+         array_to_string((string_to_array(m.to_name, '.'))[1:2], '.')),
+        ('institution',
+         array_to_string((string_to_array(m.from_name, '.'))[1:3], '.'),
+         array_to_string((string_to_array(m.to_name, '.'))[1:3], '.'))
+    ) AS lv(level, from_prefix, to_prefix)
+    WHERE lv.from_prefix <> lv.to_prefix
+)
+INSERT INTO ledger_monthly_prefix_flows AS f
+    (level, prefix, month, inflow, outflow, inflow_count, outflow_count)
+SELECT level, prefix, month,
+       SUM(inflow) * %(sign)s, SUM(outflow) * %(sign)s,
+       SUM(inflow_count) * %(sign)s, SUM(outflow_count) * %(sign)s
+FROM (
+    SELECT level, to_prefix AS prefix, month,
+           amount AS inflow, 0 AS outflow, 1 AS inflow_count, 0 AS outflow_count
+    FROM crossed
+    UNION ALL
+    SELECT level, from_prefix, month,
+           0, amount, 0, 1
+    FROM crossed
+) s
+GROUP BY level, prefix, month
+ON CONFLICT (level, prefix, month) DO UPDATE SET
+    inflow = f.inflow + EXCLUDED.inflow,
+    outflow = f.outflow + EXCLUDED.outflow,
+    inflow_count = f.inflow_count + EXCLUDED.inflow_count,
+    outflow_count = f.outflow_count + EXCLUDED.outflow_count
+"""
+
+_CLEANUP_SQL = """
+DELETE FROM {table} WHERE inflow_count = 0 AND outflow_count = 0
+"""
+
+
+def ensure_schema(cur):
+    """집계 테이블이 없으면 생성합니다. (커밋은 호출자가 수행)"""
+    cur.execute(SCHEMA_SQL)
+
+
+def apply_transfers(cur, transfer_ids, sign=1):
+    """
+    지정된 transfer들을 월별 집계에 반영합니다.
+    sign=-1 이면 집계에서 차감합니다. (거래 삭제 전에 호출)
+    호출자의 트랜잭션 안에서 실행되며, 커밋은 호출자가 수행합니다.
+    """
+    if not transfer_ids:
+        return
+
+    params = {'ids': list(transfer_ids), 'sign': sign}
+    where = "t.id = ANY(%(ids)s)"
+    cur.execute(_ACCOUNT_FLOWS_SQL.format(filter=where), params)
+    cur.execute(_PREFIX_FLOWS_SQL.format(filter=where), params)
+
+    if sign < 0:
+        cur.execute(_CLEANUP_SQL.format(table='ledger_monthly_account_flows'))
+        cur.execute(_CLEANUP_SQL.format(table='ledger_monthly_prefix_flows'))
+
+
+def backfill(conn):
+    """
+    전체 pgledger_transfers를 한 번에 집계하여 두 집계 테이블을 다시 채웁니다.
+    집계 도중 새 거래가 끼어들지 않도록 transfers 테이블에 SHARE 잠금을 겁니다.
+    """
+    cur = conn.cursor()
+    try:
+        ensure_schema(cur)
+        cur.execute("LOCK TABLE pgledger_transfers IN SHARE MODE")
+        cur.execute("TRUNCATE ledger_monthly_account_flows, ledger_monthly_prefix_flows")
+        cur.execute(_ACCOUNT_FLOWS_SQL.format(filter="TRUE"), {'sign': 1})
+        account_rows = cur.rowcount
+        cur.execute(_PREFIX_FLOWS_SQL.format(filter="TRUE"), {'sign': 1})
+        prefix_rows = cur.rowcount
+        conn.commit()
+        return account_rows, prefix_rows
+    except psycopg.Error:
+        conn.rollback()
+        raise
+
+
+def get_prefix_flows(cur, level, prefix):
+    """특정 접두사의 월별 (month, inflow, outflow) 목록을 조회합니다."""
+    cur.execute(
+        """
+        SELECT month, inflow, outflow
+        FROM ledger_monthly_prefix_flows
+        WHERE level = %s AND prefix = %s
+        ORDER BY month
+        """,
+        (level, prefix)
+    )
+    return cur.fetchall()
+
+
+def main():
+    try:
+        conn = psycopg.connect(**DB_CONFIG)
+        conn.autocommit = False
+    except psycopg.OperationalError as e:
+        print(f"\nFATAL: 데이터베이스 연결 실패. DB 설정({DB_CONFIG['dbname']}@{DB_CONFIG['host']})을 확인하세요.")
+        print(f"에러: {e}")
+        sys.exit(1)
+
+    try:
+        print("⏳ 월별 흐름 집계 전체 재계산(backfill) 중...")
+        account_rows, prefix_rows = backfill(conn)
+        print(f"✅ 계정별 {account_rows}행, 접두사별 {prefix_rows}행 집계 완료.")
+
+        prefix = input("\n조회할 접두사 (예: bank.KRW, 엔터 시 종료): ").strip()
+        if prefix:
+            level = PREFIX_LEVELS[min(prefix.count('.'), len(PREFIX_LEVELS) - 1)]
+            rows = get_prefix_flows(conn.cursor(), level, prefix)
+            print(f"\n{'월':<10} {'유입':>18} {'유출':>18}")
+            print("-" * 48)
+            for month, inflow, outflow in rows:
+                print(f"{month:%Y-%m}    {inflow:>18,.2f} {outflow:>18,.2f}")
+    except psycopg.Error as e:
+        print(f"❌ 데이터베이스 오류 발생 (롤백됨): {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+PG Ledger: 통화가 다른 두 계좌 간 환전 이체(FX transfer)
+
+pgledger_create_transfer 는 같은 통화 계좌 간에만 이체할 수 있으므로,
+환전은 통화별 환전 청산 계정(fx.KRW, fx.USD, ...)을 거치는 두 개의 leg로 기록합니다.
+
+    출금 계좌(KRW) --[원금]--> fx.KRW
+    fx.USD --[원금 × 환율]--> 입금 계좌(USD)
+
+두 leg와 적용 환율 기록(ledger_fx_conversions)은 서버 측 함수 ledger_fx_create_transfer 한 번의
+호출로 같은 트랜잭션 안에서 처리되며, ledger_fx_create_transfers 는 여러 건을 한 번에 처리합니다.
+적용 환율은 ledger_exchange_rates 테이블에서 ledger_rates_as_of 로 서버 측에서 조회하므로
+portfolio_valuation.py 의 평가 환율과 항상 같은 기준을 사용합니다.
+"""
+
+# 통화별 금액 소수 자릿수 (환전 후 금액 반올림에 사용)
+CURRENCY_SCALES = {
+    'KRW': 0,
+    'JPY': 0,
+    'USD': 2,
+}
+DEFAULT_SCALE = 2
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ledger_fx_conversions (
+    id               bigserial   PRIMARY KEY,
+    from_transfer_id text        NOT NULL,
+    to_transfer_id   text        NOT NULL,
+    from_account_id  text        NOT NULL,
+    to_account_id    text        NOT NULL,
+    from_currency    text        NOT NULL,
+    to_currency      text        NOT NULL,
+    from_amount      numeric     NOT NULL,
+    to_amount        numeric     NOT NULL,
+    rate             numeric     NOT NULL,
+    from_krw_rate    numeric     NOT NULL,
+    to_krw_rate      numeric     NOT NULL,
+    rate_date        date,
+    created_at       timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION ledger_fx_clearing_account(currency_param text)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    clearing_name text := 'fx.' || upper(currency_param);
+    clearing_id text;
+BEGIN
+    -- 동시에 같은 청산 계정을 만들지 않도록 이름 단위로 잠금
+    PERFORM pg_advisory_xact_lock(hashtext(clearing_name));
+
+    SELECT id INTO clearing_id FROM pgledger_accounts WHERE name = clearing_name;
+    IF clearing_id IS NULL THEN
+        SELECT id INTO clearing_id
+        FROM pgledger_create_account(clearing_name, upper(currency_param), TRUE, TRUE);
+    END IF;
+    RETURN clearing_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION ledger_fx_create_transfer(
+    from_account_id_param text,
+    to_account_id_param text,
+    from_amount_param numeric,
+    as_of_param date,
+    to_scale_param integer DEFAULT 2
+)
+RETURNS TABLE (
+    fx_conversion_id bigint,
+    fx_from_transfer_id text,
+    fx_to_transfer_id text,
+    fx_to_amount numeric,
+    fx_rate numeric,
+    fx_rate_date date
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    from_currency_value text;
+    to_currency_value text;
+    from_krw_rate numeric;
+    to_krw_rate numeric;
+    from_rate_date date;
+    to_rate_date date;
+    applied_rate numeric;
+    applied_rate_date date;
+    converted numeric;
+    from_leg_id text;
+    to_leg_id text;
+    new_conversion_id bigint;
+BEGIN
+    SELECT currency INTO from_currency_value FROM pgledger_accounts WHERE id = from_account_id_param;
+    SELECT currency INTO to_currency_value FROM pgledger_accounts WHERE id = to_account_id_param;
+
+    IF from_currency_value IS NULL OR to_currency_value IS NULL THEN
+        RAISE EXCEPTION 'account not found: % / %', from_account_id_param, to_account_id_param;
+    END IF;
+    IF from_currency_value = to_currency_value THEN
+        RAISE EXCEPTION 'fx transfer requires different currencies (both %)', from_currency_value;
+    END IF;
+
+    -- 평가액 계산과 같은 기준(ledger_rates_as_of)으로 두 통화의 원화 기준 고시를 조회
+    SELECT r.krw_per_unit, r.rate_date INTO from_krw_rate, from_rate_date
+    FROM ledger_rates_as_of(as_of_param) r WHERE r.currency = from_currency_value;
+    SELECT r.krw_per_unit, r.rate_date INTO to_krw_rate, to_rate_date
+    FROM ledger_rates_as_of(as_of_param) r WHERE r.currency = to_currency_value;
+
+    IF from_krw_rate IS NULL OR to_krw_rate IS NULL THEN
+        RAISE EXCEPTION 'no exchange rate for % -> % as of %', from_currency_value, to_currency_value, as_of_param;
+    END IF;
+
+    -- 교차 환율을 미리 반올림하지 않고 원금 × 출금 통화 고시 ÷ 입금 통화 고시를 한 번에 계산
+    converted := round(from_amount_param * from_krw_rate / to_krw_rate, to_scale_param);
+    applied_rate := from_krw_rate / to_krw_rate;
+    applied_rate_date := LEAST(from_rate_date, to_rate_date);
+
+    SELECT t.id INTO from_leg_id
+    FROM pgledger_create_transfer(
+        from_account_id_param, ledger_fx_clearing_account(from_currency_value), from_amount_param
+    ) t;
+
+    SELECT t.id INTO to_leg_id
+    FROM pgledger_create_transfer(
+        ledger_fx_clearing_account(to_currency_value), to_account_id_param, converted
+    ) t;
+
+    INSERT INTO ledger_fx_conversions (
+        from_transfer_id, to_transfer_id, from_account_id, to_account_id,
+        from_currency, to_currency, from_amount, to_amount, rate, from_krw_rate, to_krw_rate, rate_date
+    ) VALUES (
+        from_leg_id, to_leg_id, from_account_id_param, to_account_id_param,
+        from_currency_value, to_currency_value, from_amount_param, converted,
+        applied_rate, from_krw_rate, to_krw_rate, applied_rate_date
+    )
+    RETURNING id INTO new_conversion_id;
+
+    RETURN QUERY SELECT new_conversion_id, from_leg_id, to_leg_id, converted, applied_rate, applied_rate_date;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION ledger_fx_create_transfers(
+    from_account_ids text[],
+    to_account_ids text[],
+    from_amounts numeric[],
+    as_of_dates date[],
+    to_scales integer[]
+)
+RETURNS TABLE (
+    fx_conversion_id bigint,
+    fx_from_transfer_id text,
+    fx_to_transfer_id text,
+    fx_to_amount numeric,
+    fx_rate numeric,
+    fx_rate_date date
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    FOR i IN 1 .. COALESCE(array_length(from_account_ids, 1), 0) LOOP
+        RETURN QUERY
+        SELECT * FROM ledger_fx_create_transfer(
+            from_account_ids[i], to_account_ids[i], from_amounts[i], as_of_dates[i], to_scales[i]
+        );
+    END LOOP;
+END;
+$$;
+"""
+
+
+def ensure_schema(cur):
+    """환전 기록 테이블과 서버 측 함수를 생성/갱신합니다. (커밋은 호출자가 수행)"""
+    cur.execute(SCHEMA_SQL)
+
+
+def create_fx_transfers(cur, conversions):
+    """
+    환전 이체 여러 건을 서버 측 함수 한 번의 호출로 기록합니다.
+    적용 환율은 서버에서 ledger_rates_as_of(as_of)로 조회합니다.
+    conversions: [(from_account_id, to_account_id, from_amount, as_of, to_currency), ...]
+    반환: [(conversion_id, from_transfer_id, to_transfer_id, to_amount, rate, rate_date), ...] (입력 순서)
+    커밋은 호출자가 수행합니다.
+    """
+    if not conversions:
+        return []
+
+    cur.execute(
+        """
+        SELECT * FROM ledger_fx_create_transfers(
+            %s::text[], %s::text[], %s::numeric[], %s::date[], %s::integer[]
+        )
+        """,
+        (
+            [c[0] for c in conversions],
+            [c[1] for c in conversions],
+            [c[2] for c in conversions],
+            [c[3] for c in conversions],
+            [CURRENCY_SCALES.get(c[4], DEFAULT_SCALE) for c in conversions],
+        )
+    )
+    return cur.fetchall()
@@ -0,0 +1,142 @@
+"""
+PG Ledger: 여러 스레드에서 동시에 발생하는 이체를 하나의 트랜잭션으로 모아 커밋하는 group-commit 기록기
+
+생산자는 submit()으로 이체를 넣고 Future를 받습니다.
+단일 기록 스레드가 첫 요청이 도착한 뒤 max_wait_ms 가 지나거나 max_batch 건이 쌓이면
+대기 중인 이체를 한 트랜잭션으로 기록하고 커밋하므로, 부하가 높을 때는 커밋/WAL flush 비용이
+여러 이체에 분산되고 부하가 낮을 때도 지연은 max_wait_ms 이내로 유지됩니다.
+
+각 이체는 SAVEPOINT 안에서 실행되므로, 잔고 부족 등으로 실패한 이체는 해당 Future에만 예외가
+전달되고 같은 배치의 다른 이체는 정상적으로 커밋됩니다.
+
+    writer = GroupCommitWriter(DB_CONFIG, max_wait_ms=5, max_batch=200)
+    future = writer.submit(from_account_id, to_account_id, Decimal("1000"))
+    transfer_id = future.result()
+    writer.close()
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import psycopg
+
+import flow_aggregates
+
+DEFAULT_MAX_WAIT_MS = 5
+DEFAULT_MAX_BATCH = 200
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """단일 기록 스레드로 이체 요청을 배치 커밋하는 기록기"""
+
+    def __init__(self, db_config, max_wait_ms=DEFAULT_MAX_WAIT_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+        self.db_config = db_config
+        self.conn = self._connect()
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        # 배치 단위 트랜잭션과 이체별 SAVEPOINT를 transaction() 블록으로 직접 관리
+        conn = psycopg.connect(**self.db_config)
+        conn.autocommit = True
+        # 배치마다 갱신하는 월별 흐름 집계 테이블이 없으면 생성
+        with conn.transaction():
+            flow_aggregates.ensure_schema(conn.cursor())
+        return conn
+
+    def submit(self, from_account_id, to_account_id, amount):
+        """이체를 대기열에 넣고, 커밋 후 transfer ID가 설정될 Future를 반환합니다."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter가 이미 종료되었습니다.")
+            self._queue.put((from_account_id, to_account_id, amount, future))
+        return future
+
+    def _collect_batch(self):
+        """첫 요청을 기다린 뒤, 대기 시간 또는 최대 건수에 도달할 때까지 요청을 모읍니다."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None, True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _flush(self, batch):
+        """배치를 하나의 트랜잭션으로 기록하고, 커밋 결과를 각 Future에 전달합니다."""
+        results = []
+        try:
+            if self.conn.broken:
+                self.conn = self._connect()
+            cur = self.conn.cursor()
+            with self.conn.transaction():
+                for from_account_id, to_account_id, amount, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        # 이체별 SAVEPOINT: 실패한 이체만 되돌림
+                        with self.conn.transaction():
+                            cur.execute(
+                                "SELECT id FROM pgledger_create_transfer(%s, %s, %s)",
+                                (from_account_id, to_account_id, amount)
+                            )
+                            results.append((future, cur.fetchone()[0]))
+                    except psycopg.Error as e:
+                        future.set_exception(e)
+
+                flow_aggregates.apply_transfers(cur, [transfer_id for _, transfer_id in results])
+        except Exception as e:
+            # 커밋되지 않았으므로 결과를 기다리는 모든 요청에 예외 전달
+            for _, _, _, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+
+        for future, transfer_id in results:
+            future.set_result(transfer_id)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect_batch()
+            if batch:
+                self._flush(batch)
+
+    def close(self):
+        """대기열에 남은 요청을 모두 커밋한 뒤 기록 스레드와 연결을 종료합니다."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+PG Ledger: 장부 전체의 바이너리 스냅샷 저장/복원 도구
+
+저장(export)
+  - 하나의 REPEATABLE READ 스냅샷(pg_export_snapshot)을 모든 작업 연결이 공유하므로
+    테이블별로 병렬 저장해도 같은 시점의 일관된 장부가 저장됩니다.
+  - 테이블마다 COPY ... TO STDOUT (FORMAT binary) 결과를 gzip 파일로 스트리밍하고,
+    열 정의·행 수·체크섬을 manifest.json 에 기록합니다.
+
+복원(restore)
+  - 열 정의를 먼저 검증하고, 테이블별로 병렬로 staging 스키마의 UNLOGGED 테이블에 COPY FREEZE 로 적재합니다.
+  - 행 수까지 확인되면 하나의 트랜잭션에서 운영 테이블을 ACCESS EXCLUSIVE 로 잠그고
+    인덱스·제약 조건 삭제 → TRUNCATE → staging 복사 → PK/UNIQUE·인덱스·FK 재생성 순서로 교체합니다.
+    실패하면 전체가 롤백되어 운영 장부는 복원 전 상태로 남습니다.
+  - 교체 후 통계와 월별 흐름 집계를 갱신합니다.
+
+    python ledger_snapshot.py export snapshots/20251001 --jobs 3
+    python ledger_snapshot.py restore snapshots/20251001 --jobs 3 --yes
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import psycopg
+from psycopg import sql
+
+import flow_aggregates
+
+# 데이터베이스 연결 설정
+DB_CONFIG = {
+    'dbname': 'pgledger',
+    'user': 'pgledger',
+    'password': 'pgledger',
+    'host': 'localhost',
+    'port': 5432
+}
+
+SNAPSHOT_DIR = "snapshots"
+FORMAT_VERSION = 1
+
+# 항상 저장하는 장부 테이블과, 존재하면 함께 저장하는 부가 테이블
+LEDGER_TABLES = ['pgledger_accounts', 'pgledger_transfers', 'pgledger_entries']
+EXTRA_TABLES = ['ledger_fx_conversions', 'ledger_exchange_rates']
+
+CHUNK_SIZE = 1024 * 1024
+STAGING_SCHEMA = "ledger_snapshot_staging"
+# 교체 단계에서 운영 테이블 잠금을 기다리는 최대 시간
+LOCK_TIMEOUT = '30s'
+DEFAULT_JOBS = 3
+DEFAULT_COMPRESS_LEVEL = 3
+
+
+def _columns(cur, table):
+    """테이블의 (열 이름, 타입) 목록"""
+    cur.execute(
+        """
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+        """,
+        (table,)
+    )
+    return [list(row) for row in cur.fetchall()]
+
+
+def _existing_tables(cur, tables):
+    cur.execute("SELECT t FROM unnest(%s::text[]) AS t WHERE to_regclass(t) IS NOT NULL", (tables,))
+    found = {row[0] for row in cur.fetchall()}
+    return [t for t in tables if t in found]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------- export
+
+def _export_table(config, snapshot_id, table, directory, level):
+    """공유 스냅샷으로 테이블 하나를 바이너리 COPY 하여 gzip 파일로 저장합니다."""
+    started = time.perf_counter()
+    filename = f"{table}.copy.gz"
+    raw_bytes = 0
+
+    with psycopg.connect(**config) as conn:
+        cur = conn.cursor()
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cur.execute(sql.SQL("SET TRANSACTION SNAPSHOT {}").format(sql.Literal(snapshot_id)))
+        columns = _columns(cur, table)
+
+        query = sql.SQL("COPY {} ({}) TO STDOUT (FORMAT binary)").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(sql.Identifier(name) for name, _ in columns),
+        )
+        with gzip.open(os.path.join(directory, filename), "wb", compresslevel=level) as out:
+            with cur.copy(query) as copy:
+                for data in copy:
+                    raw_bytes += len(data)
+                    out.write(data)
+        rows = cur.rowcount
+        conn.rollback()
+
+    path = os.path.join(directory, filename)
+    return {
+        'table': table,
+        'file': filename,
+        'columns': columns,
+        'rows': rows,
+        'raw_bytes': raw_bytes,
+        'compressed_bytes': os.path.getsize(path),
+        'sha256': _sha256(path),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def export_snapshot(directory, config=DB_CONFIG, jobs=DEFAULT_JOBS, level=DEFAULT_COMPRESS_LEVEL):
+    """장부 테이블을 같은 시점 기준으로 병렬 저장하고 manifest 를 반환합니다."""
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+
+    # 스냅샷을 내보낸 트랜잭션은 모든 작업이 끝날 때까지 열려 있어야 함
+    with psycopg.connect(**config) as coordinator:
+        cur = coordinator.cursor()
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cur.execute("SELECT pg_export_snapshot(), now(), current_setting('server_version')")
+        snapshot_id, snapshot_at, server_version = cur.fetchone()
+        tables = LEDGER_TABLES + _existing_tables(cur, EXTRA_TABLES)
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(
+                lambda table: _export_table(config, snapshot_id, table, directory, level), tables
+            ))
+        coordinator.rollback()
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'snapshot_at': snapshot_at.isoformat(),
+        'server_version': server_version,
+        'database': config.get('dbname'),
+        'seconds': round(time.perf_counter() - started, 3),
+        'tables': results,
+    }
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+# ---------------------------------------------------------------- restore
+
+def _capture_ddl(cur, tables):
+    """
+    대상 테이블의 제약 조건/인덱스 정의를 조회합니다.
+    반환: (keys, indexes, foreign_keys) — 각각 (테이블, 이름, 생성 DDL) 목록
+    """
+    cur.execute(
+        """
+        SELECT c.contype, c.conrelid::regclass::text, c.conname, pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        WHERE c.contype IN ('p', 'u', 'f')
+          AND (c.conrelid = ANY(%(oids)s) OR c.confrelid = ANY(%(oids)s))
+        ORDER BY c.contype DESC, c.conname
+        """,
+        {'oids': _regclasses(cur, tables)}
+    )
+    keys, foreign_keys = [], []
+    for contype, table, name, definition in cur.fetchall():
+        ddl = sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(
+            sql.SQL(table), sql.Identifier(name), sql.SQL(definition)
+        ).as_string(cur)
+        (foreign_keys if contype == 'f' else keys).append((table, name, ddl))
+
+    cur.execute(
+        """
+        SELECT i.indrelid::regclass::text, i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        ORDER BY 2
+        """,
+        (_regclasses(cur, tables),)
+    )
+    indexes = [tuple(row) for row in cur.fetchall()]
+    return keys, indexes, foreign_keys
+
+
+def _regclasses(cur, tables):
+    # search_path 기준으로 해석 (staging 스키마의 같은 이름 테이블은 제외)
+    cur.execute("SELECT to_regclass(t)::oid FROM unnest(%s::text[]) AS t WHERE to_regclass(t) IS NOT NULL", (tables,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _staging_table(table):
+    return sql.Identifier(STAGING_SCHEMA, table)
+
+
+def _check_columns(cur, entries):
+    """manifest 의 열 정의가 현재 테이블과 같은지 확인합니다. (다르면 ValueError)"""
+    for entry in entries:
+        target = {name: type_ for name, type_ in _columns(cur, entry['table'])}
+        for name, type_ in entry['columns']:
+            if target.get(name) != type_:
+                raise ValueError(f"{entry['table']}.{name} 열 정의가 다릅니다: {type_} != {target.get(name)}")
+
+
+def _stage_table(config, directory, entry):
+    """스냅샷 파일 하나를 staging 스키마의 UNLOGGED 테이블로 적재합니다. (운영 테이블은 건드리지 않음)"""
+    started = time.perf_counter()
+    staging = _staging_table(entry['table'])
+    with psycopg.connect(**config) as conn:
+        cur = conn.cursor()
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(staging))
+        cur.execute(sql.SQL("CREATE UNLOGGED TABLE {} ({})").format(
+            staging,
+            sql.SQL(", ").join(
+                sql.SQL("{} {}").format(sql.Identifier(name), sql.SQL(type_)) for name, type_ in entry['columns']
+            ),
+        ))
+        query = sql.SQL("COPY {} FROM STDIN (FORMAT binary, FREEZE)").format(staging)
+        with gzip.open(os.path.join(directory, entry['file']), "rb") as src:
+            with cur.copy(query) as copy:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    copy.write(chunk)
+        rows = cur.rowcount
+        if entry.get('rows') not in (None, -1) and rows != entry['rows']:
+            conn.rollback()
+            raise ValueError(f"{entry['table']} 행 수 불일치: {rows} != {entry['rows']}")
+        conn.commit()
+
+    return entry['table'], rows, time.perf_counter() - started
+
+
+def _swap_in(conn, entries):
+    """
+    하나의 트랜잭션에서 운영 테이블을 잠그고 staging 데이터로 교체합니다.
+    인덱스/제약 조건은 삭제 후 적재가 끝나면 다시 만들며, 어느 단계에서든 실패하면 전체가 롤백됩니다.
+    """
+    tables = [entry['table'] for entry in entries]
+    cur = conn.cursor()
+    cur.execute("SET LOCAL lock_timeout = %s", (LOCK_TIMEOUT,))
+    cur.execute("SET LOCAL maintenance_work_mem = '512MB'")
+    # 교체가 끝날 때까지 다른 세션의 읽기/쓰기를 모두 차단
+    cur.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(
+        sql.SQL(", ").join(sql.Identifier(t) for t in tables)
+    ))
+    _check_columns(cur, entries)
+    keys, indexes, foreign_keys = _capture_ddl(cur, tables)
+
+    # 1. FK → PK/UNIQUE → 일반 인덱스 삭제 후 비우기
+    for table, name, _ in foreign_keys + keys:
+        cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(sql.SQL(table), sql.Identifier(name)))
+    for _, index, _ in indexes:
+        cur.execute(sql.SQL("DROP INDEX {}").format(sql.SQL(index)))
+    cur.execute(sql.SQL("TRUNCATE {}").format(sql.SQL(", ").join(sql.Identifier(t) for t in tables)))
+
+    # 2. staging → 운영 테이블 (서버 내부 복사)
+    for entry in entries:
+        columns = sql.SQL(", ").join(sql.Identifier(name) for name, _ in entry['columns'])
+        cur.execute(sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {}").format(
+            sql.Identifier(entry['table']), columns, columns, _staging_table(entry['table'])
+        ))
+
+    # 3. PK/UNIQUE → 일반 인덱스 → FK 재생성 (적재 후 한 번에 만들어 건별 인덱스 갱신을 피함)
+    for _, _, ddl in keys + indexes + foreign_keys:
+        cur.execute(ddl)
+
+    # 4. 시퀀스 위치
+    for table in tables:
+        for name, _ in _columns(cur, table):
+            cur.execute("SELECT pg_get_serial_sequence(%s, %s)", (table, name))
+            sequence = cur.fetchone()[0]
+            if sequence:
+                cur.execute(
+                    sql.SQL("SELECT setval(%s, COALESCE((SELECT max({}) FROM {}), 0) + 1, false)").format(
+                        sql.Identifier(name), sql.Identifier(table)
+                    ),
+                    (sequence,)
+                )
+
+
+def restore_snapshot(directory, config=DB_CONFIG, jobs=DEFAULT_JOBS, verify=True):
+    """
+    스냅샷 디렉터리의 장부를 복원합니다. (대상 테이블의 기존 데이터는 모두 대체됨)
+    1) 체크섬과 열 정의를 검증하고, 2) 운영 테이블과 별개인 staging 테이블에 병렬 적재·행 수 검증한 뒤,
+    3) 하나의 트랜잭션에서 운영 테이블을 잠그고 교체합니다.
+    어느 단계에서 실패해도 운영 장부는 복원 전 상태(인덱스·제약 조건 포함) 그대로 남습니다.
+    """
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"지원하지 않는 스냅샷 형식입니다: {manifest.get('format_version')}")
+
+    entries = manifest['tables']
+    if verify:
+        for entry in entries:
+            if _sha256(os.path.join(directory, entry['file'])) != entry['sha256']:
+                raise ValueError(f"체크섬 불일치: {entry['file']}")
+
+    tables = [entry['table'] for entry in entries]
+    timings = {}
+    started = time.perf_counter()
+
+    with psycopg.connect(**config) as conn:
+        cur = conn.cursor()
+        _check_columns(cur, entries)
+        cur.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(STAGING_SCHEMA)))
+        conn.commit()
+
+        try:
+            # 1. staging 테이블로 병렬 적재
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                loaded = list(pool.map(lambda entry: _stage_table(config, directory, entry), entries))
+            timings['load'] = time.perf_counter() - t0
+
+            # 2. 운영 테이블 교체 (단일 트랜잭션)
+            t0 = time.perf_counter()
+            with conn.transaction():
+                _swap_in(conn, entries)
+            timings['swap'] = time.perf_counter() - t0
+        finally:
+            conn.rollback()
+            cur.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(STAGING_SCHEMA)))
+            conn.commit()
+
+    # 3. 통계, 파생 집계 갱신
+    t0 = time.perf_counter()
+    with psycopg.connect(**config, autocommit=True) as conn:
+        cur = conn.cursor()
+        for table in tables:
+            cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+    with psycopg.connect(**config) as conn:
+        flow_aggregates.backfill(conn)
+    timings['finalize'] = time.perf_counter() - t0
+
+    timings['total'] = time.perf_counter() - started
+    return loaded, timings
+
+
+def snapshot_before(action_name, config=DB_CONFIG):
+    """
+    관리자 작업 직전에 스냅샷을 snapshots/<시각>_before_<작업> 에 저장하고 경로를 반환합니다.
+    실패하면 None 을 반환합니다.
+    """
+    directory = os.path.join(SNAPSHOT_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_before_{action_name}")
+    try:
+        print(f"\n⏳ 스냅샷 저장 중... ({directory})")
+        manifest = export_snapshot(directory, config)
+        print(f"✅ 스냅샷 저장 완료 ({manifest['seconds']} s)")
+        return directory
+    except (psycopg.Error, OSError) as e:
+        print(f"❌ 스냅샷 저장 실패: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="장부 바이너리 스냅샷 저장/복원")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="스냅샷 저장")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS)
+    export_parser.add_argument("--level", type=int, default=DEFAULT_COMPRESS_LEVEL, help="gzip 압축 수준 (1-9)")
+
+    restore_parser = sub.add_parser("restore", help="스냅샷 복원 (기존 장부 대체)")
+    restore_parser.add_argument("directory")
+    restore_parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS)
+    restore_parser.add_argument("--no-verify", action="store_true", help="체크섬 검증 생략")
+    restore_parser.add_argument("--yes", action="store_true", help="기존 장부 대체에 동의")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            manifest = export_snapshot(args.directory, jobs=args.jobs, level=args.level)
+            for entry in manifest['tables']:
+                print(f"  ✅ {entry['table']:<24} {entry['rows']:>12,} rows "
+                      f"{entry['compressed_bytes'] / 1024 / 1024:>10.1f} MB {entry['seconds']:>8.2f} s")
+            print(f"🎉 스냅샷 저장 완료: {args.directory} ({manifest['seconds']} s)")
+        else:
+            if not args.yes:
+                print(f"⚠️ '{DB_CONFIG['dbname']}' 데이터베이스의 장부가 스냅샷 내용으로 대체됩니다. 계속하려면 --yes 를 지정하세요.")
+                sys.exit(1)
+            loaded, timings = restore_snapshot(args.directory, jobs=args.jobs, verify=not args.no_verify)
+            for table, rows, seconds in loaded:
+                print(f"  ✅ {table:<24} {rows:>12,} rows {seconds:>8.2f} s")
+            for step, seconds in timings.items():
+                print(f"  ⏱️ {step:<14} {seconds:>8.2f} s")
+            print("🎉 스냅샷 복원 완료")
+    except psycopg.OperationalError as e:
+        print(f"\nFATAL: 데이터베이스 연결 실패. DB 설정({DB_CONFIG['dbname']}@{DB_CONFIG['host']})을 확인하세요.")
+        print(f"에러: {e}")
+        sys.exit(1)
+    except (psycopg.Error, ValueError, OSError) as e:
+        print(f"❌ 오류 발생: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,19 @@
 """
 Simple stock investment ledger using pgledger
 """
+import csv
 import psycopg
 from datetime import datetime
 from decimal import Decimal
 import sys
 
+import flow_aggregates
+import fx_transfer
+import profiling
+from account_picker import AccountIndex, balance_fetcher, pick_account
+from db_routing import ConnectionRouter
+import exchange_rates
+
 # Database connection
 DB_CONFIG = {
     'dbname': 'pgledger',
@@ -36,22 +44,58 @@ BANK_NAMES = {
     '6': 'test'
 }
 
+# 앱이 사용하는 부가 스키마가 모두 설치되어 있는지 확인
+SCHEMA_CHECK_SQL = """
+SELECT to_regclass('ledger_monthly_account_flows') IS NOT NULL
+   AND to_regclass('ledger_monthly_prefix_flows') IS NOT NULL
+   AND to_regclass('ledger_exchange_rates') IS NOT NULL
+   AND to_regclass('ledger_fx_conversions') IS NOT NULL
+   AND (SELECT count(DISTINCT proname) FROM pg_proc
+        WHERE proname IN ('ledger_rates_as_of', 'ledger_fx_clearing_account',
+                          'ledger_fx_create_transfer', 'ledger_fx_create_transfers')) = 4
+"""
+
 
 class StockLedger:
-    def __init__(self):
-        self.conn = psycopg.connect(**DB_CONFIG)
-        self.conn.autocommit = False
+    def __init__(self, install_schema=False):
+        # 쓰기는 primary(self.conn), 목록 조회는 router.read()로 replica에 라우팅
+        self.router = ConnectionRouter.from_env(DB_CONFIG)
+        self.conn = self.router.primary
         self.accounts = {}
+        self.currencies = {}
+        self._ensure_schema(force=install_schema)
         self.load_accounts()
+
+    def _ensure_schema(self, force=False):
+        """
+        월별 흐름 집계 테이블, 환율 테이블, 환전 함수가 없으면 생성합니다.
+        이미 설치되어 있으면 DDL 없이 건너뛰며, force=True(--install-schema)면 함수 정의를 갱신합니다.
+        동시에 시작한 클라이언트끼리는 advisory lock 으로 설치를 직렬화합니다.
+        """
+        cur = self.conn.cursor()
+        if not force:
+            cur.execute(SCHEMA_CHECK_SQL)
+            if cur.fetchone()[0]:
+                self.conn.commit()
+                return
+
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('pgledger.schema_install'))")
+        flow_aggregates.ensure_schema(cur)
+        exchange_rates.ensure_schema(cur)
+        fx_transfer.ensure_schema(cur)
+        self.conn.commit()
         
     def load_accounts(self):
         """데이터베이스에서 모든 계정 정보를 로드하여 self.accounts에 저장"""
-        cur = self.conn.cursor()
-        cur.execute("SELECT id, name FROM pgledger_accounts_view ORDER BY name")
+        with self.router.read() as cur:
+            cur.execute("SELECT id, name, currency FROM pgledger_accounts_view ORDER BY name")
+            rows = cur.fetchall()
         
         self.accounts = {}
-        for account_id, name in cur.fetchall():
+        self.currencies = {}
+        for account_id, name, currency in rows:
             self.accounts[name] = account_id
+            self.currencies[account_id] = currency
         
         if self.accounts:
             print(f"✅ 기존 계정 {len(self.accounts)}개 로드 완료.")
@@ -75,14 +119,16 @@ class StockLedger:
             )
             account_id = cur.fetchone()[0]
             
-            # 3. 인스턴스 변수에 ID 저장
+            # 3. 인스턴스 변수에 ID와 통화 저장
             self.accounts[name] = account_id
+            self.currencies[account_id] = currency.upper()
             return True, account_id
             
         except psycopg.Error as e:
             print(f"❌ 데이터베이스 오류 발생 ({name}): {e}")
             return False, None
 
+    @profiling.profiled("registration")
     def create_asset_pair_by_menu(self, group, currency, detail, last_four_digits):
         """
         메뉴 입력값을 받아 'bank.KRW.woori.8472' 형식의 계정 pair를 생성합니다.
@@ -111,10 +157,63 @@ class StockLedger:
         # 3. 최종 커밋 
         if asset_created or liquidity_created:
             self.conn.commit()
+            self.router.note_write()
             print("  🎉 계좌 pair 설정 완료 (DB 커밋).")
         else:
             print("  ✔️ 변경 사항 없음. (두 계정 모두 이미 존재함).")
 
+    @profiling.profiled("registration")
+    def provision_pairs(self, pairs):
+        """
+        (group, currency, detail, digits) 목록으로 자산/유동성 계정 pair를 한 트랜잭션에서 일괄 생성합니다.
+        기존 계정은 한 번의 조회로 걸러내고, 나머지는 단일 set 기반 쿼리로 생성합니다.
+        반환: (생성된 계정 수, 이미 존재하여 건너뛴 계정 수), 실패 시 None
+        """
+        wanted = {}
+        for group, currency, detail, digits in pairs:
+            wanted[f"{group}.{currency}.{detail}.{digits}"] = currency
+            wanted[f"liquidity.{currency}.{detail}.{digits}"] = currency
+
+        cur = self.conn.cursor()
+        try:
+            # 조회와 생성 사이에 다른 일괄 등록이 같은 이름을 만들지 못하도록 트랜잭션 단위 advisory lock
+            # (테이블 잠금과 달리 동시에 진행되는 이체는 막지 않음)
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('pgledger.provision_pairs'))")
+            cur.execute(
+                "SELECT name, id, currency FROM pgledger_accounts WHERE name = ANY(%s)",
+                (list(wanted),)
+            )
+            existing_rows = cur.fetchall()
+            existing = {name: account_id for name, account_id, _ in existing_rows}
+
+            new_names = [name for name in wanted if name not in existing]
+            created = []
+            if new_names:
+                cur.execute(
+                    """
+                    SELECT u.name, a.id
+                    FROM unnest(%s::text[], %s::text[]) AS u(name, currency)
+                    CROSS JOIN LATERAL pgledger_create_account(u.name, u.currency, TRUE, TRUE) a
+                    """,
+                    (new_names, [wanted[name] for name in new_names])
+                )
+                created = cur.fetchall()
+
+            self.conn.commit()
+            self.router.note_write()
+        except psycopg.Error as e:
+            print(f"❌ 데이터베이스 오류 발생 (롤백됨): {e}")
+            self.conn.rollback()
+            return None
+
+        # 조회/생성 결과로 계정 목록을 일괄 갱신
+        self.accounts.update(existing)
+        self.accounts.update(created)
+        self.currencies.update((account_id, currency) for _, account_id, currency in existing_rows)
+        self.currencies.update((account_id, wanted[name]) for name, account_id in created)
+        return len(created), len(existing)
+
+    @profiling.profiled("transfer")
     def record_transaction(self, from_account_id, to_account_id, amount):
         """
         지정된 계좌 간의 거래를 기록합니다.
@@ -130,7 +229,10 @@ class StockLedger:
             )
             
             transfer_id = cur.fetchone()[0]
+            # 같은 트랜잭션 안에서 월별 흐름 집계 갱신
+            flow_aggregates.apply_transfers(cur, [transfer_id])
             self.conn.commit()
+            self.router.note_write()
             
             print(f"  ✅ 거래 성공! [Transfer ID: {transfer_id}]")
             return True
@@ -140,14 +242,62 @@ class StockLedger:
             self.conn.rollback()
             return False
 
+    @profiling.profiled("transfer")
+    def record_fx_transactions(self, transfers, on_date=None):
+        """
+        통화가 다른 계좌 간 환전 이체 여러 건을 한 번의 서버 측 호출과 한 번의 커밋으로 기록합니다.
+        transfers: [(from_account_id, to_account_id, amount), ...]
+        적용 환율은 서버에서 ledger_rates_as_of(on_date, 기본: 오늘)로 조회합니다.
+        """
+        on_date = on_date or datetime.now().date()
 
+        cur = self.conn.cursor()
+        try:
+            # 계정 통화는 이름이 아니라 pgledger_accounts.currency 기준 (로드되지 않은 계정만 조회)
+            currencies = self.currencies
+            unknown = {account_id for transfer in transfers for account_id in transfer[:2]} - currencies.keys()
+            if unknown:
+                cur.execute("SELECT id, currency FROM pgledger_accounts WHERE id = ANY(%s)", (list(unknown),))
+                currencies = {**currencies, **dict(cur.fetchall())}
+
+            conversions = []
+            for from_account_id, to_account_id, amount in transfers:
+                to_currency = currencies.get(to_account_id)
+                if currencies.get(from_account_id) is None or to_currency is None:
+                    print(f"  ❌ 계정을 찾을 수 없습니다: {from_account_id} -> {to_account_id}")
+                    self.conn.rollback()
+                    return None
+                conversions.append((from_account_id, to_account_id, amount, on_date, to_currency))
+
+            print(f"\n--- 환전 거래 실행: {len(conversions)}건 ---")
+            results = fx_transfer.create_fx_transfers(cur, conversions)
+            flow_aggregates.apply_transfers(
+                cur, [transfer_id for _, from_leg, to_leg, _, _, _ in results for transfer_id in (from_leg, to_leg)]
+            )
+            self.conn.commit()
+            self.router.note_write()
+        except psycopg.Error as e:
+            print(f"  ❌ 환전 거래 실패: {e}")
+            self.conn.rollback()
+            return None
+
+        # 새로 생성된 환전 청산 계정(fx.*) 반영
+        self.load_accounts()
+        for (_, _, amount, _, _), (conversion_id, _, _, to_amount, rate, rate_date) in zip(conversions, results):
+            print(f"  ✅ 환전 성공! {amount} -> {to_amount} (환율 {rate}, 고시일 {rate_date}) [Conversion ID: {conversion_id}]")
+        return results
+
+    def record_fx_transaction(self, from_account_id, to_account_id, amount, on_date=None):
+        """통화가 다른 두 계좌 간 환전 이체 한 건을 기록합니다."""
+        return self.record_fx_transactions([(from_account_id, to_account_id, amount)], on_date) is not None
+
+    @profiling.profiled("listing")
     def show_all_accounts(self, show_id=False):
         """현재 모든 계정의 이름, ID제외, 잔고를 조회"""
         if not self.accounts:
             print("\n🚨 등록된 계정이 없습니다.")
             return
             
-        cur = self.conn.cursor()
         # header 설정 관련
         header_base= f"{'계정 이름':<25} {'잔고':>14} {'버전':>3}"
         header_with_id= f"{'계정 이름':<25}  {'ID':>2} {'잔고':>48} {'버전':>3}"
@@ -160,23 +310,25 @@ class StockLedger:
         
         sorted_names = sorted(self.accounts.keys())
         
-        for name in sorted_names:
-            account_id = self.accounts[name]
-            cur.execute(
-                "SELECT balance, version FROM pgledger_accounts_view WHERE id = %s",
-                (account_id,)
-            )
-            balance, version = cur.fetchone()
-            # 출력 형식 변경
-            if show_id:
-                print(f"{name:<30} {account_id:<20} {balance:>15} (v{version})")
-            else:
-                print(f"{name:<30} {balance:>15} (v{version})")
+        with self.router.read() as cur:
+            for name in sorted_names:
+                account_id = self.accounts[name]
+                cur.execute(
+                    "SELECT balance, version FROM pgledger_accounts_view WHERE id = %s",
+                    (account_id,)
+                )
+                balance, version = cur.fetchone()
+                # 출력 형식 변경
+                if show_id:
+                    print(f"{name:<30} {account_id:<20} {balance:>15} (v{version})")
+                else:
+                    print(f"{name:<30} {balance:>15} (v{version})")
 
     def close(self):
-        self.conn.close()
+        self.router.close()
 
 
+@profiling.profiled("transfer")
 def process_transaction(ledger):
     """3. 거래 기록 메뉴의 워크플로우를 처리하는 함수"""
     
@@ -184,63 +336,28 @@ def process_transaction(ledger):
         print("\n🚨 거래를 기록하기 전에 먼저 계좌를 등록해야 합니다.")
         return
 
-    # 이름순으로 정렬된 전체 계좌 목록
-    all_accounts = sorted(ledger.accounts.items(), key=lambda item: item[0])
-    
-    # 기본적으로 보여줄 계좌 목록 (liquidity 제외)
-    visible_accounts = [(name, acc_id) for name, acc_id in all_accounts if not name.startswith('liquidity.')]
-
-    while True:
-        print("\n--- 3. 거래 기록 (계좌 선택) ---")
-        cur = ledger.conn.cursor()
-        print(f"{'번호':<5} {'계정 이름':<30} {'현재 잔고':>15}")
-        print("-" * 55)
-        
-        for i, (name, account_id) in enumerate(visible_accounts):
-            cur.execute("SELECT balance FROM pgledger_accounts_view WHERE id = %s", (account_id,))
-            balance = cur.fetchone()[0]
-            print(f"{i + 1:<5} {name:<30} {balance:>15,.0f}")
-        
-        print("-" * 55)
-        if len(visible_accounts) < len(all_accounts):
-            print("99. 모든 계좌 보기 (liquidity 포함)")
-
-        try:
-            from_choice_str = input("\n어떤 계좌에서 출금하시겠습니까? (번호 입력): ").strip()
-            
-            if from_choice_str == '99' and len(visible_accounts) < len(all_accounts):
-                visible_accounts = all_accounts
-                continue # 메뉴를 다시 보여줌
-
-            from_choice = int(from_choice_str) - 1
-            if not 0 <= from_choice < len(visible_accounts):
-                print("❗ 잘못된 번호입니다.")
-                continue
-            
-            from_account_id = visible_accounts[from_choice][1]
-            from_account_name = visible_accounts[from_choice][0]
-            break # 출금 계좌 선택 완료
-
-        except ValueError:
-            print("❗ 숫자로 입력해주세요.")
-            continue
+    # 전체 계좌 인덱스와 기본적으로 보여줄 계좌 인덱스 (liquidity, 환전 청산 계정 제외)
+    all_index = AccountIndex(ledger.accounts.items())
+    visible_index = AccountIndex(
+        (name, acc_id) for name, acc_id in ledger.accounts.items()
+        if not name.startswith(('liquidity.', 'fx.'))
+    )
+    fetch_balances = balance_fetcher(ledger.router)
+
+    # 출금 계좌 선택
+    picked = pick_account(visible_index, fetch_balances, "3. 거래 기록 (출금 계좌 선택)", full_index=all_index)
+    if picked is None:
+        return
+    from_account_name, from_account_id = picked
 
     # 3. 입금 계좌 선택
-    try:
-        to_choice = int(input(f"어떤 계좌로 입금하시겠습니까? (번호 입력): ")) - 1
-        if not 0 <= to_choice < len(visible_accounts):
-            print("❗ 잘못된 번호입니다.")
-            return
-            
-        if visible_accounts[from_choice][1] == visible_accounts[to_choice][1]:
-            print("❗ 출금 계좌와 입금 계좌는 같을 수 없습니다.")
-            return
-
-        to_account_id = visible_accounts[to_choice][1]
-        to_account_name = visible_accounts[to_choice][0]
+    picked = pick_account(visible_index, fetch_balances, "3. 거래 기록 (입금 계좌 선택)", full_index=all_index)
+    if picked is None:
+        return
+    to_account_name, to_account_id = picked
 
-    except ValueError:
-        print("❗ 숫자로 입력해주세요.")
+    if from_account_id == to_account_id:
+        print("❗ 출금 계좌와 입금 계좌는 같을 수 없습니다.")
         return
 
     # 4. 금액 입력
@@ -256,10 +373,62 @@ def process_transaction(ledger):
         print("❗ 유효한 금액을 입력해주세요.")
         return
 
-    # 5. 거래 실행
-    ledger.record_transaction(from_account_id, to_account_id, amount)
+    # 5. 거래 실행 (통화가 다르면 환전 이체)
+    if ledger.currencies.get(from_account_id) != ledger.currencies.get(to_account_id):
+        ledger.record_fx_transaction(from_account_id, to_account_id, amount)
+    else:
+        ledger.record_transaction(from_account_id, to_account_id, amount)
+
+
+def load_pair_manifest(path):
+    """
+    계좌 pair 매니페스트(CSV)를 읽어 (group, currency, detail, digits) 목록을 반환합니다.
+    헤더: group,currency,institution,digits  (예: bank,KRW,woori,8472)
+    형식이 잘못된 행은 행 번호와 함께 건너뜁니다.
+    """
+    pairs = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                group = row['group'].strip().lower()
+                currency = row['currency'].strip().upper()
+                detail = row['institution'].strip().lower()
+                digits = row['digits'].strip()
+            except (KeyError, AttributeError):
+                print(f"  ⚠️ {line_no}행: 필수 열(group, currency, institution, digits)이 없습니다.")
+                continue
+
+            if not (group.isalnum() and detail.isalnum()
+                    and len(currency) == 3 and currency.isalpha()
+                    and digits.isdigit() and len(digits) <= 10):
+                print(f"  ⚠️ {line_no}행: 유효하지 않은 값입니다. ({group},{currency},{detail},{digits})")
+                continue
+            pairs.append((group, currency, detail, digits))
+    return pairs
+
+
+@profiling.profiled("registration")
+def process_manifest_registration(ledger):
+    """4. 매니페스트 기반 계좌 일괄 등록 워크플로우를 처리하는 함수"""
+    path = input("\n매니페스트 파일 경로 (CSV: group,currency,institution,digits): ").strip()
+    try:
+        pairs = load_pair_manifest(path)
+    except OSError as e:
+        print(f"❌ 매니페스트 파일을 읽을 수 없습니다: {e}")
+        return
+
+    if not pairs:
+        print("🚨 등록할 계좌 pair가 없습니다.")
+        return
+
+    print(f"\n--- 계좌 pair {len(pairs)}개 일괄 생성 시도 ---")
+    result = ledger.provision_pairs(pairs)
+    if result is not None:
+        created, skipped = result
+        print(f"  🎉 계정 {created}개 생성, 이미 존재하는 계정 {skipped}개 건너뜀 (DB 커밋).")
 
 
+@profiling.profiled("registration")
 def process_account_registration(ledger):
     """2. 계좌 등록 메뉴의 워크플로우를 처리하는 함수"""
     
@@ -318,12 +487,14 @@ def display_menu():
     print("1. 계정 목록 및 잔고 조회")
     print("2. 계좌 등록 (은행, 증권사)")
     print("3. 거래 기록")
-    print("4. 종료")
+    print("4. 계좌 일괄 등록 (매니페스트)")
+    print("5. 종료")
     print("-" * 40)
 
 def main():
     try:
-        ledger = StockLedger()
+        # python main1.py --install-schema : 배포 후 부가 스키마(함수 정의 포함)를 다시 설치
+        ledger = StockLedger(install_schema='--install-schema' in sys.argv[1:])
     except psycopg.OperationalError as e:
         print(f"\nFATAL: 데이터베이스 연결 실패. DB 설정({DB_CONFIG['dbname']}@{DB_CONFIG['host']})을 확인하세요.")
         print(f"에러: {e}")
@@ -331,7 +502,7 @@ def main():
 
     while True:
         display_menu()
-        choice = input("메뉴 선택 (1-4): ")
+        choice = input("메뉴 선택 (1-5): ")
         
         if choice == '1':
             while True:
@@ -362,11 +533,14 @@ def main():
             process_transaction(ledger)
                 
         elif choice == '4':
+            process_manifest_registration(ledger)
+
+        elif choice == '5':
             print("\n시스템을 종료합니다. 감사합니다.")
             break
             
         else:
-            print("❗ 잘못된 입력입니다. 1, 2, 3, 4 중 하나를 선택하세요.")
+            print("❗ 잘못된 입력입니다. 1, 2, 3, 4, 5 중 하나를 선택하세요.")
 
     ledger.close()
 
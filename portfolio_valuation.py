@@ -0,0 +1,378 @@
+"""
+PG Ledger: 계정별/전체 일별 원화 평가액 시계열 계산 스크립트
+
+pgledger_entries 로부터 (날짜 × 계정) 잔고 행렬을 복원하고,
+ledger_rates_as_of 로 날짜별 적용 환율(기준일 이전 가장 최근 고시)을 서버 측에서 조회하여
+NumPy 배열 연산만으로 평가액을 계산합니다. (환율 테이블이 없으면 exchange_rates.json 을 사용)
+결과 잔고 행렬은 로컬 캐시(.npz)에 저장되어, 다음 실행 시에는 새로 추가된 날짜분만 조회합니다.
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import psycopg
+
+from exchange_rates import BASE_CURRENCY, load_exchange_rates
+
+# 데이터베이스 연결 설정
+DB_CONFIG = {
+    'dbname': 'pgledger',
+    'user': 'pgledger',
+    'password': 'pgledger',
+    'host': 'localhost',
+    'port': 5432
+}
+
+CACHE_FILENAME = "valuation_cache.npz"
+
+KST = timezone(timedelta(hours=9))
+
+
+class ValuationSeries:
+    """
+    일별 평가액 시계열.
+    dates: (D,) datetime64[D], balances/values: (D, A) float64, total: (D,) float64
+    """
+
+    def __init__(self, dates, account_ids, names, currencies, balances, rates):
+        self.dates = dates
+        self.account_ids = account_ids
+        self.names = names
+        self.currencies = currencies
+        self.balances = balances
+        self.rates = rates
+        self.values = balances * rates
+        # 환율이 없는 통화의 계정(NaN)은 합계에서 제외
+        self.total = np.nansum(self.values, axis=1)
+
+    def account_series(self, name):
+        """계정 이름으로 해당 계정의 일별 원화 평가액을 반환합니다."""
+        return self.values[:, self.names.index(name)]
+
+
+def _kst_midnight(day):
+    """date를 KST 자정 시각(timestamptz)으로 변환합니다."""
+    return datetime(day.year, day.month, day.day, tzinfo=KST)
+
+
+def _date_range(start, end):
+    """start~end(포함) 날짜를 datetime64[D] 배열로 반환합니다."""
+    return np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+
+
+def fetch_accounts(cur):
+    """전체 계정의 (id, name, currency) 목록을 이름순으로 조회합니다."""
+    cur.execute("SELECT id, name, currency FROM pgledger_accounts_view ORDER BY name")
+    return cur.fetchall()
+
+
+def fetch_daily_deltas(cur, since=None):
+    """
+    계정별·일별(KST) 잔고 변동 합계를 한 번의 쿼리로 조회합니다.
+    since가 주어지면 해당 날짜(포함) 이후의 엔트리만 집계합니다.
+    """
+    query = """
+        SELECT account_id,
+               (created_at AT TIME ZONE 'Asia/Seoul')::date AS day,
+               SUM(amount)
+        FROM pgledger_entries
+    """
+    params = ()
+    if since is not None:
+        query += " WHERE created_at >= %s"
+        params = (_kst_midnight(since),)
+    query += " GROUP BY account_id, day"
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def fetch_fingerprint(cur, until):
+    """
+    until 날짜(포함)까지의 엔트리 개수와 내용 체크섬을 조회합니다.
+    캐시 생성 이후 과거 날짜로 기록·삭제된 거래가 있는지 판별하는 데 사용합니다.
+    복식부기에서 SUM(amount)는 항상 0이므로, 금액 절댓값 합계와 엔트리별 해시 합계(순서 무관)를 사용합니다.
+    """
+    cur.execute(
+        """
+        SELECT COUNT(*),
+               COALESCE(SUM(abs(amount)), 0),
+               COALESCE(SUM(hashtext(concat_ws(':', account_id, transfer_id, amount, created_at))::bigint), 0)
+        FROM pgledger_entries
+        WHERE created_at < %s
+        """,
+        (_kst_midnight(until + timedelta(days=1)),)
+    )
+    count, abs_sum, hash_sum = cur.fetchone()
+    return int(count), f"{abs_sum}:{hash_sum}"
+
+
+def load_cache(filename=CACHE_FILENAME):
+    """캐시 파일을 읽어 (dates, account_ids, balances, fingerprint)를 반환합니다. 없으면 None."""
+    if not os.path.exists(filename):
+        return None
+    try:
+        with np.load(filename, allow_pickle=False) as data:
+            return (
+                data["dates"],
+                [str(a) for a in data["account_ids"]],
+                data["balances"],
+                (int(data["fp_count"]), str(data["fp_sum"])),
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_cache(dates, account_ids, balances, fingerprint, filename=CACHE_FILENAME):
+    """잔고 행렬과 검증용 fingerprint를 캐시 파일로 저장합니다."""
+    np.savez(
+        filename,
+        dates=dates,
+        account_ids=np.array(account_ids, dtype=str),
+        balances=balances,
+        fp_count=np.int64(fingerprint[0]),
+        fp_sum=np.array(fingerprint[1]),
+    )
+
+
+def build_balance_matrix(deltas, account_index, start, end, base=None):
+    """
+    (account_id, day, amount) 목록을 (날짜 × 계정) 잔고 행렬로 변환합니다.
+    base가 주어지면 start 이전의 계정별 잔고로 사용합니다.
+    """
+    n_days = (end - start).days + 1
+    n_accounts = len(account_index)
+    matrix = np.zeros((n_days, n_accounts), dtype=np.float64)
+
+    # 조회 도중 생성된 계정 등 인덱스에 없는 계정은 제외
+    deltas = [row for row in deltas if row[0] in account_index]
+    if deltas:
+        rows = np.fromiter(((d - start).days for _, d, _ in deltas), dtype=np.int64, count=len(deltas))
+        cols = np.fromiter((account_index[a] for a, _, _ in deltas), dtype=np.int64, count=len(deltas))
+        amounts = np.fromiter((float(v) for _, _, v in deltas), dtype=np.float64, count=len(deltas))
+        np.add.at(matrix, (rows, cols), amounts)
+
+    np.cumsum(matrix, axis=0, out=matrix)
+    if base is not None:
+        matrix += base
+    return matrix
+
+
+def forward_filled_rates(rates, currencies, dates):
+    """
+    통화별 환율을 날짜축에 정렬하고 forward-fill 하여 (날짜 × 통화) 배열로 반환합니다.
+    첫 고시일 이전 구간은 첫 고시 환율로 채우며, 고시 기록이 없는 통화는 NaN입니다.
+    """
+    out = np.full((len(dates), len(currencies)), np.nan, dtype=np.float64)
+
+    for j, currency in enumerate(currencies):
+        if currency == BASE_CURRENCY:
+            out[:, j] = 1.0
+            continue
+
+        series = rates.get(currency)
+        if not series:
+            continue
+
+        known_dates = np.array([d for d, _ in series], dtype='datetime64[D]')
+        known_rates = np.array([r for _, r in series], dtype=np.float64)
+        # 각 날짜에 대해 당일 또는 그 이전 가장 최근 고시의 위치
+        idx = np.searchsorted(known_dates, dates, side='right') - 1
+        out[:, j] = known_rates[np.clip(idx, 0, None)]
+
+    return out
+
+
+def fetch_rate_matrix(cur, currencies, dates):
+    """
+    dates 각 날짜의 통화별 1단위당 원화 환율을 ledger_rates_as_of 로 서버 측에서 조회하여
+    (날짜 × 통화) 배열로 반환합니다. (FX 이체와 같은 기준)
+    forward_filled_rates 와 같이 첫 고시일 이전 구간은 첫 고시 환율로 채우며, 고시 기록이 없는 통화는 NaN입니다.
+    """
+    out = np.full((len(dates), len(currencies)), np.nan, dtype=np.float64)
+    if not len(dates):
+        return out
+
+    start = dates[0].astype(date)
+    cur.execute(
+        """
+        SELECT d.day::date, r.currency, r.krw_per_unit
+        FROM generate_series(%s::date, %s::date, interval '1 day') AS d(day)
+        CROSS JOIN LATERAL ledger_rates_as_of(d.day::date) r
+        WHERE r.currency = ANY(%s)
+        """,
+        (start, dates[-1].astype(date), list(currencies))
+    )
+    rows = cur.fetchall()
+    if rows:
+        day_idx = np.fromiter(((d - start).days for d, _, _ in rows), dtype=np.int64, count=len(rows))
+        col_idx = np.fromiter((currencies.index(c) for _, c, _ in rows), dtype=np.int64, count=len(rows))
+        values = np.fromiter((float(v) for _, _, v in rows), dtype=np.float64, count=len(rows))
+        out[day_idx, col_idx] = values
+
+    # 첫 고시일 이전 구간을 첫 고시 환율로 채움
+    for j in range(len(currencies)):
+        known = np.flatnonzero(~np.isnan(out[:, j]))
+        if len(known):
+            out[:known[0], j] = out[known[0], j]
+    return out
+
+
+def _has_rate_lookup(cur):
+    """환율 테이블과 ledger_rates_as_of 함수가 설치되어 있는지 확인합니다."""
+    cur.execute(
+        "SELECT to_regclass('ledger_exchange_rates') IS NOT NULL"
+        " AND to_regprocedure('ledger_rates_as_of(date)') IS NOT NULL"
+    )
+    return cur.fetchone()[0]
+
+
+def compute_valuation(conn, end=None, rates=None, cache_filename=CACHE_FILENAME):
+    """
+    전체 장부의 일별 원화 평가액 시계열을 계산합니다.
+    캐시가 유효하면 마지막 캐시 날짜 다음 날부터의 엔트리만 조회하여 행렬을 확장합니다.
+    rates({통화: [(date, 1단위당 원화), ...]})를 주지 않으면 환율도 같은 스냅샷에서 서버 측으로 조회합니다.
+    모든 조회는 하나의 REPEATABLE READ 스냅샷에서 실행되므로, 도중에 소급 기록된 거래가
+    잔고 행렬과 캐시 fingerprint 중 한쪽에만 반영되는 일이 없습니다. (conn은 트랜잭션 밖이어야 함)
+    """
+    if end is None:
+        end = datetime.now(KST).date()
+
+    with conn.transaction():
+        cur = conn.cursor()
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        return _compute_valuation(cur, end, rates, cache_filename)
+
+
+def _empty_series(accounts):
+    n_accounts = len(accounts)
+    return ValuationSeries(
+        np.array([], dtype='datetime64[D]'),
+        [a[0] for a in accounts],
+        [a[1] for a in accounts],
+        [a[2] for a in accounts],
+        np.zeros((0, n_accounts), dtype=np.float64),
+        np.zeros((0, n_accounts), dtype=np.float64),
+    )
+
+
+def _compute_valuation(cur, end, rates, cache_filename):
+    accounts = fetch_accounts(cur)
+    account_ids = [a[0] for a in accounts]
+    account_index = {account_id: i for i, account_id in enumerate(account_ids)}
+
+    cached = load_cache(cache_filename) if cache_filename else None
+    if cached is not None:
+        cached_dates, cached_ids, cached_balances, fingerprint = cached
+        cache_end = cached_dates[-1].astype(date)
+        # 과거 날짜로 추가/삭제된 엔트리가 있으면 캐시를 버리고 전체 재계산
+        if cache_end > end or fetch_fingerprint(cur, cache_end) != fingerprint:
+            cached = None
+
+    if cached is None:
+        deltas = [row for row in fetch_daily_deltas(cur) if row[1] <= end]
+        if not deltas:
+            return _empty_series(accounts)
+        start = min(d for _, d, _ in deltas)
+        balances = build_balance_matrix(deltas, account_index, start, end)
+        dates = _date_range(start, end)
+    else:
+        # 캐시된 계정 열을 현재 계정 순서에 맞추고, 새 계정은 0으로 채움
+        cached_cols = {account_id: i for i, account_id in enumerate(cached_ids)}
+        prior = np.zeros((len(cached_dates), len(account_ids)), dtype=np.float64)
+        for account_id, j in account_index.items():
+            if account_id in cached_cols:
+                prior[:, j] = cached_balances[:, cached_cols[account_id]]
+
+        if cache_end < end:
+            since = cache_end + timedelta(days=1)
+            deltas = [row for row in fetch_daily_deltas(cur, since=since) if row[1] <= end]
+            recent = build_balance_matrix(deltas, account_index, since, end, base=prior[-1])
+            balances = np.vstack([prior, recent])
+        else:
+            balances = prior
+        dates = np.concatenate([
+            cached_dates,
+            _date_range(cache_end + timedelta(days=1), end),
+        ])
+
+    # 당일은 아직 거래가 추가될 수 있으므로 전날까지만 캐시에 저장
+    if cache_filename and len(dates) > 1:
+        cache_until = end - timedelta(days=1)
+        save_cache(dates[:-1], account_ids, balances[:-1], fetch_fingerprint(cur, cache_until), cache_filename)
+
+    currencies = sorted({a[2] for a in accounts})
+    currency_col = np.array([currencies.index(a[2]) for a in accounts], dtype=np.int64)
+    if rates is None and _has_rate_lookup(cur):
+        currency_rates = fetch_rate_matrix(cur, currencies, dates)
+    else:
+        currency_rates = forward_filled_rates(
+            rates if rates is not None else load_exchange_rates(), currencies, dates
+        )
+    rate_matrix = currency_rates[:, currency_col]
+
+    missing = [c for j, c in enumerate(currencies) if np.isnan(currency_rates[:, j]).all()]
+    if missing:
+        print(f"⚠️ 환율 정보가 없는 통화는 합계에서 제외됩니다: {', '.join(missing)}")
+
+    return ValuationSeries(
+        dates,
+        account_ids,
+        [a[1] for a in accounts],
+        [a[2] for a in accounts],
+        balances,
+        rate_matrix,
+    )
+
+
+def fetch_current_valuation(cur, as_of=None):
+    """
+    계정별 현재 잔고를 as_of 시점 환율(ledger_exchange_rates)로 서버 측에서 원화 환산합니다.
+    반환: [(id, name, currency, balance, krw_per_unit, krw_value), ...] (환율 없는 통화는 None)
+    """
+    cur.execute(
+        """
+        SELECT a.id, a.name, a.currency, a.balance, r.krw_per_unit, a.balance * r.krw_per_unit
+        FROM pgledger_accounts_view a
+        LEFT JOIN ledger_rates_as_of(%s) r ON r.currency = a.currency
+        ORDER BY a.name
+        """,
+        (as_of or datetime.now(KST).date(),)
+    )
+    return cur.fetchall()
+
+
+def main():
+    try:
+        conn = psycopg.connect(**DB_CONFIG)
+    except psycopg.OperationalError as e:
+        print(f"\nFATAL: 데이터베이스 연결 실패. DB 설정({DB_CONFIG['dbname']}@{DB_CONFIG['host']})을 확인하세요.")
+        print(f"에러: {e}")
+        sys.exit(1)
+
+    try:
+        series = compute_valuation(conn)
+        cur = conn.cursor()
+        current = fetch_current_valuation(cur) if len(series.dates) and _has_rate_lookup(cur) else None
+    finally:
+        conn.close()
+
+    if not len(series.dates):
+        print("\n🚨 평가할 거래 기록이 없습니다.")
+        return
+
+    print(f"\n=== 일별 원화 평가액 ({series.dates[0]} ~ {series.dates[-1]}, 계정 {len(series.account_ids)}개) ===")
+    print(f"{'날짜':<12} {'총 평가액(KRW)':>20}")
+    print("-" * 34)
+    for day, total in zip(series.dates[-10:], series.total[-10:]):
+        print(f"{str(day):<12} {total:>20,.0f}")
+
+    # 현재 잔고 × 오늘 기준 환율 (서버 측 결합, 환율 테이블이 없으면 생략)
+    if current is None:
+        return
+    valued = [row for row in current if row[5] is not None]
+    print(f"\n현재 총 평가액(KRW): {sum(row[5] for row in valued):,.0f} (환율 적용 계정 {len(valued)}/{len(current)}개)")
+
+
+if __name__ == '__main__':
+    main()
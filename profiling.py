@@ -0,0 +1,189 @@
+"""
+PG Ledger: 메뉴 동작 단위 프로파일링
+
+환경 변수 PGLEDGER_PROFILE_DIR 이 설정되면 켜집니다.
+    PGLEDGER_PROFILE_DIR=./profiles python main1.py
+
+메뉴 동작 함수(process_transaction 등)를 @profiled("transfer") 등으로 감싸면 동작마다
+  - cProfile 호출 통계 (<시각>_<동작>.prof, pstats/snakeviz 로 열람)
+  - 동작 중 실행된 SQL 문장별 소요 시간과 EXPLAIN (ANALYZE, BUFFERS) 실행 계획 (<시각>_<동작>.txt)
+을 기록합니다.
+
+SQL 수집은 profiling.connect()로 만든 연결에서만 이루어집니다.
+기록되는 소요 시간은 실제 문장 실행의 시간이며, 실행 계획은 그 뒤에 수집합니다.
+  - 조회 문장: 실제 실행 직후 같은 연결에서 SAVEPOINT(또는 별도 트랜잭션)로 감싼 EXPLAIN (ANALYZE, BUFFERS)
+    를 실행하고 되돌립니다. 버퍼가 이미 데워진 뒤이므로 계획의 시간·buffers hit 은 warm 기준입니다.
+  - 쓰기 문장(INSERT/UPDATE/DELETE/MERGE, pgledger_create_* / ledger_fx_* 함수 호출): 두 번 실행하지 않도록
+    ANALYZE 없는 EXPLAIN 만 기록합니다.
+실행 계획 수집 시간은 cProfile 통계에서 제외됩니다.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import psycopg
+from psycopg import sql
+
+PROFILE_DIR = os.environ.get("PGLEDGER_PROFILE_DIR")
+
+# EXPLAIN 이 가능한 문장 종류
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'VALUES', 'MERGE')
+
+# 데이터를 변경하는 문장 (EXPLAIN ANALYZE 로 다시 실행하지 않음)
+# 이 저장소의 쓰기는 대부분 SELECT 로 감싼 장부 함수 호출이므로 해당 함수 이름도 쓰기로 취급
+_WRITE_PATTERN = re.compile(
+    r'\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|pgledger_create_\w+|ledger_fx_\w+)\b', re.IGNORECASE
+)
+
+_local = threading.local()
+
+
+def enabled():
+    return bool(PROFILE_DIR)
+
+
+class _ActionProfile:
+    """한 동작의 cProfile 과 실행된 SQL 기록"""
+
+    def __init__(self, name):
+        self.name = name
+        self.profiler = cProfile.Profile()
+        self.statements = []
+        self.started_at = datetime.now()
+
+    def write_report(self, elapsed):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{self.started_at:%Y%m%d_%H%M%S_%f}_{self.name}")
+        self.profiler.dump_stats(base + ".prof")
+
+        stats_out = io.StringIO()
+        pstats.Stats(self.profiler, stream=stats_out).sort_stats('cumulative').print_stats(40)
+
+        sql_total = sum(s['elapsed'] for s in self.statements)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"동작: {self.name}\n")
+            f.write(f"시작: {self.started_at:%Y-%m-%d %H:%M:%S}\n")
+            f.write(f"전체 소요: {elapsed * 1000:.1f} ms\n")
+            f.write(f"SQL {len(self.statements)}건 소요: {sql_total * 1000:.1f} ms\n")
+            f.write("※ 문장별 소요 시간은 실제 실행 기준이며, EXPLAIN ANALYZE 계획은 실제 실행 직후(warm 캐시)에 수집됨\n\n")
+
+            f.write("=" * 80 + "\n[Python 호출 통계 (cumulative 상위 40)]\n" + "=" * 80 + "\n")
+            f.write(stats_out.getvalue())
+
+            f.write("\n" + "=" * 80 + "\n[SQL 문장별 실행 계획]\n" + "=" * 80 + "\n")
+            for i, stmt in enumerate(self.statements, start=1):
+                f.write(f"\n--- #{i} ({stmt['elapsed'] * 1000:.2f} ms) ---\n")
+                f.write(stmt['query'].strip() + "\n")
+                if stmt['params'] is not None:
+                    f.write(f"params: {stmt['params']}\n")
+                f.write((stmt['plan'] or "(EXPLAIN 대상 아님)") + "\n")
+
+        print(f"📊 프로파일 저장: {base}.prof / {base}.txt")
+
+
+def _current_action():
+    return getattr(_local, 'action', None)
+
+
+def _query_text(query, context):
+    if isinstance(query, sql.Composable):
+        return query.as_string(context)
+    if isinstance(query, bytes):
+        return query.decode()
+    return query
+
+
+class ProfilingCursor(psycopg.Cursor):
+    """프로파일링 중인 동작이 있으면 실행 문장과 실행 계획을 기록하는 커서"""
+
+    def execute(self, query, params=None, **kwargs):
+        action = _current_action()
+        if action is None:
+            return super().execute(query, params, **kwargs)
+
+        text = _query_text(query, self)
+        record = {
+            'query': text,
+            'params': None if params is None else repr(params)[:500],
+            'elapsed': None,
+            'plan': None,
+        }
+        action.statements.append(record)
+
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, params, **kwargs)
+        finally:
+            record['elapsed'] = time.perf_counter() - started
+
+        # 실제 실행이 끝난 뒤 수집하므로 실제 문장의 소요 시간과 버퍼 통계에 영향을 주지 않음
+        record['plan'] = self._explain(action, text, params)
+        return result
+
+    def _explain(self, action, text, params):
+        if not text.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        if self.connection.info.transaction_status == psycopg.pq.TransactionStatus.INERROR:
+            return None
+
+        write = _WRITE_PATTERN.search(text) is not None
+        action.profiler.disable()
+        try:
+            # 되돌려서 실제 문장 실행 이후의 상태에 영향을 주지 않음
+            with self.connection.transaction(force_rollback=True):
+                cur = psycopg.Cursor(self.connection)
+                if write:
+                    cur.execute("EXPLAIN " + text, params)
+                    prefix = "(쓰기 문장: ANALYZE 생략)\n"
+                else:
+                    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + text, params)
+                    prefix = ""
+                return prefix + "\n".join(row[0] for row in cur.fetchall())
+        except psycopg.Error as e:
+            return f"(EXPLAIN 실패: {e})"
+        finally:
+            action.profiler.enable()
+
+
+def connect(**config):
+    """프로파일링이 켜져 있으면 SQL 을 수집하는 커서를 사용하는 연결을 만듭니다."""
+    if enabled():
+        return psycopg.connect(cursor_factory=ProfilingCursor, **config)
+    return psycopg.connect(**config)
+
+
+@contextmanager
+def action(name):
+    """블록을 하나의 동작으로 프로파일링합니다. (중첩 시 바깥 동작에 포함)"""
+    if not enabled() or _current_action() is not None:
+        yield
+        return
+
+    current = _ActionProfile(name)
+    _local.action = current
+    started = time.perf_counter()
+    current.profiler.enable()
+    try:
+        yield
+    finally:
+        current.profiler.disable()
+        _local.action = None
+        current.write_report(time.perf_counter() - started)
+
+
+def profiled(name):
+    """함수를 하나의 동작으로 프로파일링하는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with action(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
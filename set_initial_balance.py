@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 """
 PG Ledger: 초기 잔고를 직접 수정하는 스크립트
-데이터베이스 테이블을 직접 UPDATE하여 잔고와 날짜를 설정합니다.
+기준 날짜로 소급한 입금 거래를 기록하여 잔고와 날짜를 설정합니다.
 """
 import psycopg
 import sys
 from datetime import datetime, timezone, timedelta
 
+import flow_aggregates
+import ledger_snapshot
+import profiling
+from backdated_transfer import post_backdated_transfer
+from account_picker import AccountIndex, balance_fetcher, pick_account
+from db_routing import shared_router
+
 # 데이터베이스 연결 설정
 DB_CONFIG = {
     'dbname': 'pgledger',
@@ -25,32 +32,28 @@ def get_account_info(cur, account_name):
     return cur.fetchone()
 
 def get_modifiable_accounts():
-    """데이터베이스에서 'bank.'로 시작하며 잔고가 0인 모든 계정 목록을 조회합니다."""
-    conn = None
+    """데이터베이스에서 'bank.'로 시작하며 잔고가 0인 모든 계정의 (이름, ID) 목록을 조회합니다."""
     try:
-        conn = psycopg.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT name, currency, balance
-            FROM pgledger_accounts_view 
-            WHERE name LIKE 'bank.%' AND balance = 0
-            ORDER BY name
-        """)
-        return cur.fetchall()
+        with shared_router(DB_CONFIG).read() as cur:
+            cur.execute("""
+                SELECT name, id
+                FROM pgledger_accounts_view 
+                WHERE name LIKE 'bank.%' AND balance = 0
+                ORDER BY name
+            """)
+            return cur.fetchall()
     except psycopg.Error as e:
         print(f"❌ 데이터베이스 오류 발생: 계좌 목록을 불러올 수 없습니다. {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled("opening_balance")
 def update_account_balance_direct(account_name, amount, event_date_str):
     """
-    계정의 잔고를 직접 UPDATE하고 거래 기록을 특정 날짜로 생성합니다.
+    liquidity 계정에서 자산 계정으로의 거래를 특정 날짜로 소급 기록하여 잔고를 설정합니다.
     """
     conn = None
     try:
-        conn = psycopg.connect(**DB_CONFIG)
+        conn = profiling.connect(**DB_CONFIG)
         conn.autocommit = False
         cur = conn.cursor()
 
@@ -81,67 +84,16 @@ def update_account_balance_direct(account_name, amount, event_date_str):
         event_datetime = event_datetime.replace(hour=2, minute=0, second=0, tzinfo=kst)
         print(f"✅ 이벤트 시각: {event_datetime}")
         
-        # 4. pgledger_accounts 테이블 직접 업데이트
-        print(f"\n🔧 계정 잔고 업데이트 중...")
-        
-        # 자산 계정 업데이트 (잔고 증가)
-        cur.execute("""
-            UPDATE pgledger_accounts 
-            SET balance = balance + %s,
-                version = version + 1,
-                updated_at = %s
-            WHERE id = %s
-        """, (amount, event_datetime, account_id))
-        
-        # 상대 계정 업데이트 (잔고 감소)
-        cur.execute("""
-            UPDATE pgledger_accounts 
-            SET balance = balance - %s,
-                version = version + 1,
-                updated_at = %s
-            WHERE id = %s
-        """, (amount, event_datetime, liquidity_id))
-        
-        print(f"   ✅ {account_name}: 잔고 {current_balance} → {current_balance + amount}")
-        
-        # 5. pgledger_transfers 테이블에 거래 기록 생성
-        print(f"\n🔧 거래 기록 생성 중...")
-        cur.execute("""
-            INSERT INTO pgledger_transfers 
-            (from_account_id, to_account_id, amount, created_at, event_at)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id
-        """, (liquidity_id, account_id, amount, event_datetime, event_datetime))
-        
-        transfer_id = cur.fetchone()[0]
+        # 4. 소급 거래 기록 (liquidity → 자산 계정)
+        # 이후에 기록된 엔트리의 잔고/버전 체인과 계정 잔고, 월별 흐름 집계도 함께 보정됨
+        print(f"\n🔧 소급 거래 기록 및 이후 엔트리 보정 중...")
+        flow_aggregates.ensure_schema(cur)
+        transfer_id, repaired = post_backdated_transfer(cur, liquidity_id, account_id, amount, event_datetime)
         print(f"   ✅ Transfer ID: {transfer_id}")
+        print(f"   ✅ {account_name}: 잔고 {current_balance} → {current_balance + amount}")
+        print(f"   ✅ 이후 엔트리 {repaired}건 보정 완료")
         
-        # 6. pgledger_entries 테이블에 엔트리 생성
-        print(f"\n🔧 엔트리 기록 생성 중...")
-        
-        # 출금 엔트리 (liquidity 계정)
-        cur.execute("""
-            INSERT INTO pgledger_entries 
-            (account_id, transfer_id, amount, account_previous_balance, 
-             account_current_balance, account_version, created_at)
-            VALUES (%s, %s, %s, %s, %s, 
-                    (SELECT version FROM pgledger_accounts WHERE id = %s), 
-                    %s)
-        """, (liquidity_id, transfer_id, -amount, amount, 0, liquidity_id, event_datetime))
-        
-        # 입금 엔트리 (자산 계정)
-        cur.execute("""
-            INSERT INTO pgledger_entries 
-            (account_id, transfer_id, amount, account_previous_balance, 
-             account_current_balance, account_version, created_at)
-            VALUES (%s, %s, %s, %s, %s, 
-                    (SELECT version FROM pgledger_accounts WHERE id = %s), 
-                    %s)
-        """, (account_id, transfer_id, amount, 0, amount, account_id, event_datetime))
-        
-        print(f"   ✅ 엔트리 생성 완료")
-        
-        # 7. 커밋
+        # 5. 커밋
         conn.commit()
         print(f"\n🎉 성공: 계정 '{account_name}'의 잔고가 {amount} {currency}로 설정되었습니다.")
         print(f"   - 이벤트 날짜: {event_datetime.strftime('%Y-%m-%d %H:%M:%S %Z')}")
@@ -176,27 +128,19 @@ if __name__ == '__main__':
         print("🚨 잔고를 설정할 수 있는 'bank.' 계좌가 없거나, 모든 계좌의 잔고가 0이 아닙니다.")
         sys.exit(1)
         
-    print("--- 잔고가 0인 계좌 목록 (수정 가능) ---\n")
-    for i, (name, currency, balance) in enumerate(accounts):
-        print(f"  {i+1}. {name} ({currency}) - 현재 잔고: {balance}")
-        
-    print()
-    account_name = None
-    while True:
-        try:
-            choice = input("계좌 번호 선택: ").strip()
-            idx = int(choice) - 1
-            if 0 <= idx < len(accounts):
-                account_name = accounts[idx][0]
-                print(f"✅ {account_name} 선택 완료.\n")
-                break
-            else:
-                print("❗ 잘못된 번호입니다. 목록 내의 번호를 선택해 주세요.")
-        except ValueError:
-            print("❗ 숫자를 입력해 주세요.")
-        except KeyboardInterrupt:
-            print("\n\n❌ 사용자가 취소했습니다.")
-            sys.exit(0)
+    try:
+        picked = pick_account(
+            AccountIndex(accounts),
+            balance_fetcher(shared_router(DB_CONFIG)),
+            "잔고가 0인 계좌 목록 (수정 가능)",
+        )
+    except KeyboardInterrupt:
+        picked = None
+    if picked is None:
+        print("\n\n❌ 사용자가 취소했습니다.")
+        sys.exit(0)
+    account_name = picked[0]
+    print(f"✅ {account_name} 선택 완료.\n")
 
     # 2. 금액 입력
     try:
@@ -236,6 +180,10 @@ if __name__ == '__main__':
     confirm = input("\n진행하시겠습니까? (yes/y): ").strip().lower()
     
     if confirm in ['yes', 'y']:
+        if input("수정 전에 장부 스냅샷을 저장하시겠습니까? (y/N): ").strip().lower() in ['yes', 'y']:
+            if ledger_snapshot.snapshot_before("opening_balance", DB_CONFIG) is None:
+                print("\n❌ 스냅샷 저장에 실패하여 작업을 취소합니다.")
+                sys.exit(1)
         success = update_account_balance_direct(account_name, amount, start_date_input)
         if success:
             print("\n✅ 모든 작업이 완료되었습니다!")
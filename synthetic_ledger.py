@@ -0,0 +1,260 @@
+"""
+PG Ledger: 벤치마크용 합성 장부 데이터 생성기
+
+'bank.CCY.기관.계좌번호' / 'liquidity.CCY.기관.계좌번호' 규칙의 계좌 pair와
+입금·출금·계좌 간 이체로 이루어진 거래 이력을 seed 기반으로 결정적으로 생성하여 COPY로 적재합니다.
+pgledger_entries 의 잔고/버전 체인과 계정 잔고는 적재된 이체로부터 set 기반 SQL로 계산합니다.
+
+⚠️ 대상 데이터베이스의 pgledger 테이블을 모두 비우고 다시 채웁니다. 벤치마크 전용 DB에만 사용하세요.
+
+    python synthetic_ledger.py --pairs 100000 --transfers 25000000 --seed 42 --dbname pgledger_bench --yes
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import psycopg
+
+import flow_aggregates
+import fx_transfer
+
+# 벤치마크 전용 데이터베이스 연결 설정
+BENCH_DB_CONFIG = {
+    'dbname': 'pgledger_bench',
+    'user': 'pgledger',
+    'password': 'pgledger',
+    'host': 'localhost',
+    'port': 5432
+}
+
+KST = timezone(timedelta(hours=9))
+
+# (통화, 선택 가중치, 1회 거래 금액 범위, 소수 자릿수)
+CURRENCY_PROFILES = [
+    ('KRW', 70, (1_000, 5_000_000), 0),
+    ('USD', 20, (1, 5_000), 2),
+    ('JPY', 10, (100, 500_000), 0),
+]
+
+INSTITUTIONS = ['woori', 'toss', 'kb', 'hana', 'ibk', 'shinhan', 'nh', 'kakao', 'sc', 'citi']
+
+# 거래가 전혀 없는 계좌 pair 비율 (초기 잔고 설정 벤치마크 대상)
+EMPTY_PAIR_RATIO = 0.1
+
+
+def _amount(rng, low, high, scale):
+    """로그 균등 분포 금액"""
+    value = low * (high / low) ** rng.random()
+    return Decimal(value).quantize(Decimal(1).scaleb(-scale))
+
+
+def generate_pairs(rng, n_pairs):
+    """중복 없는 (통화, 자산 계정 이름, 유동성 계정 이름) 목록을 생성합니다."""
+    currencies = [p[0] for p in CURRENCY_PROFILES]
+    weights = [p[1] for p in CURRENCY_PROFILES]
+
+    seen = set()
+    pairs = []
+    while len(pairs) < n_pairs:
+        currency = rng.choices(currencies, weights)[0]
+        institution = rng.choice(INSTITUTIONS)
+        digits = str(rng.randrange(1_000, 100_000_000))
+        suffix = f"{currency}.{institution}.{digits}"
+        if suffix in seen:
+            continue
+        seen.add(suffix)
+        pairs.append((currency, f"bank.{suffix}", f"liquidity.{suffix}"))
+    return pairs
+
+
+def generate_transfers(rng, pairs, account_ids, n_transfers, start, years):
+    """
+    (from_account_id, to_account_id, amount, created_at) 이체를 시간순으로 생성합니다.
+    활성 pair마다 첫 이체로 초기 입금을 넣고, 이후에는 입금/출금/같은 통화 계좌 간 이체를 섞습니다.
+    """
+    profiles = {p[0]: p for p in CURRENCY_PROFILES}
+    active = [p for p in pairs if rng.random() >= EMPTY_PAIR_RATIO] or pairs
+    by_currency = {}
+    for pair in active:
+        by_currency.setdefault(pair[0], []).append(pair)
+
+    # 기간 전체에 고르게 분포하도록 지수 분포 간격으로 시각을 증가시킴 (전체 정렬 불필요)
+    span_us = years * 365 * 86_400 * 1_000_000
+    rate = n_transfers / span_us
+    balances = {}
+    opened = set()
+    clock = 0.0
+    last = -1
+
+    for _ in range(n_transfers):
+        clock += rng.expovariate(rate)
+        # created_at 이 엄격히 증가하도록 보정 (엔트리 순서 결정에 사용)
+        offset = max(int(clock), last + 1)
+        last = offset
+        created_at = start + timedelta(microseconds=offset)
+
+        currency, bank, liquidity = rng.choice(active)
+        _, _, (low, high), scale = profiles[currency]
+        amount = _amount(rng, low, high, scale)
+        balance = balances.get(bank, 0)
+
+        if bank not in opened:
+            opened.add(bank)
+            amount *= 20
+            src, dst = liquidity, bank
+        else:
+            kind = rng.random()
+            if kind < 0.4 or balance < amount:
+                src, dst = liquidity, bank
+            elif kind < 0.7:
+                src, dst = bank, liquidity
+            else:
+                other = rng.choice(by_currency[currency])[1]
+                if other == bank:
+                    src, dst = liquidity, bank
+                else:
+                    src, dst = bank, other
+
+        if src.startswith('bank.'):
+            balances[src] = balances.get(src, 0) - amount
+        if dst.startswith('bank.'):
+            balances[dst] = balances.get(dst, 0) + amount
+
+        yield account_ids[src], account_ids[dst], amount, created_at
+
+
+ENTRIES_SQL = """
+INSERT INTO pgledger_entries
+    (account_id, transfer_id, amount, account_previous_balance,
+     account_current_balance, account_version, created_at)
+SELECT account_id, transfer_id, amount,
+       running - amount, running, version, created_at
+FROM (
+    SELECT s.*,
+           SUM(amount) OVER w AS running,
+           row_number() OVER w AS version
+    FROM (
+        SELECT from_account_id AS account_id, id AS transfer_id, -amount AS amount, created_at
+        FROM pgledger_transfers
+        UNION ALL
+        SELECT to_account_id, id, amount, created_at
+        FROM pgledger_transfers
+    ) s
+    WINDOW w AS (PARTITION BY account_id ORDER BY created_at, transfer_id ROWS UNBOUNDED PRECEDING)
+) x
+"""
+
+ACCOUNT_TOTALS_SQL = """
+UPDATE pgledger_accounts a
+SET balance = e.balance,
+    version = e.version,
+    updated_at = e.updated_at
+FROM (
+    SELECT account_id, SUM(amount) AS balance, COUNT(*) AS version, MAX(created_at) AS updated_at
+    FROM pgledger_entries
+    GROUP BY account_id
+) e
+WHERE a.id = e.account_id
+"""
+
+
+def reset_ledger(cur):
+    """pgledger 테이블과 파생 집계 테이블을 비웁니다."""
+    flow_aggregates.ensure_schema(cur)
+    fx_transfer.ensure_schema(cur)
+    cur.execute("""
+        TRUNCATE pgledger_entries, pgledger_transfers, pgledger_accounts,
+                 ledger_monthly_account_flows, ledger_monthly_prefix_flows,
+                 ledger_fx_conversions
+    """)
+
+
+def generate(conn, n_pairs, n_transfers, seed, years=3, start=None):
+    """
+    합성 장부를 생성하여 적재하고 단계별 소요 시간(초)을 반환합니다.
+    같은 seed와 규모로 생성하면 항상 같은 계좌·거래가 만들어집니다.
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2020, 1, 1, tzinfo=KST)
+    timings = {}
+    cur = conn.cursor()
+
+    t0 = time.perf_counter()
+    reset_ledger(cur)
+
+    pairs = generate_pairs(rng, n_pairs)
+    with cur.copy(
+        "COPY pgledger_accounts (name, currency, allow_negative_balance, allow_positive_balance) FROM STDIN"
+    ) as copy:
+        for currency, bank, liquidity in pairs:
+            copy.write_row((bank, currency, True, True))
+            copy.write_row((liquidity, currency, True, True))
+    cur.execute("SELECT name, id FROM pgledger_accounts")
+    account_ids = dict(cur.fetchall())
+    timings['accounts'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with cur.copy(
+        "COPY pgledger_transfers (from_account_id, to_account_id, amount, created_at, event_at) FROM STDIN"
+    ) as copy:
+        for from_id, to_id, amount, created_at in generate_transfers(
+                rng, pairs, account_ids, n_transfers, start, years):
+            copy.write_row((from_id, to_id, amount, created_at, created_at))
+    timings['transfers'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    cur.execute(ENTRIES_SQL)
+    cur.execute(ACCOUNT_TOTALS_SQL)
+    timings['entries'] = time.perf_counter() - t0
+    conn.commit()
+
+    t0 = time.perf_counter()
+    flow_aggregates.backfill(conn)
+    conn.autocommit = True
+    cur.execute("ANALYZE pgledger_accounts, pgledger_transfers, pgledger_entries")
+    conn.autocommit = False
+    timings['aggregates'] = time.perf_counter() - t0
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크용 합성 장부 데이터 생성")
+    parser.add_argument("--pairs", type=int, default=1_000, help="계좌 pair 수")
+    parser.add_argument("--transfers", type=int, default=100_000, help="이체 수 (엔트리는 2배)")
+    parser.add_argument("--years", type=float, default=3, help="거래 기간 (년)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dbname", default=BENCH_DB_CONFIG['dbname'])
+    parser.add_argument("--yes", action="store_true", help="대상 DB의 기존 장부 삭제에 동의")
+    args = parser.parse_args()
+
+    if not args.yes:
+        print(f"⚠️ '{args.dbname}' 데이터베이스의 장부가 모두 삭제됩니다. 계속하려면 --yes 를 지정하세요.")
+        sys.exit(1)
+
+    config = dict(BENCH_DB_CONFIG, dbname=args.dbname)
+    try:
+        conn = psycopg.connect(**config)
+    except psycopg.OperationalError as e:
+        print(f"\nFATAL: 데이터베이스 연결 실패. DB 설정({config['dbname']}@{config['host']})을 확인하세요.")
+        print(f"에러: {e}")
+        sys.exit(1)
+
+    try:
+        print(f"⏳ 합성 장부 생성 중... (pair {args.pairs:,}개, 이체 {args.transfers:,}건, seed={args.seed})")
+        timings = generate(conn, args.pairs, args.transfers, args.seed, years=args.years)
+        for step, seconds in timings.items():
+            print(f"  ✅ {step:<12} {seconds:>10.2f} s")
+    except psycopg.Error as e:
+        conn.rollback()
+        print(f"❌ 데이터베이스 오류 발생 (롤백됨): {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,19 @@ import json
 from datetime import datetime, timedelta, timezone
 import os
 
+import psycopg
+
+from exchange_rates import upsert_rates
+
+# 데이터베이스 연결 설정 (환율 테이블 동기화용)
+DB_CONFIG = {
+    'dbname': 'pgledger',
+    'user': 'pgledger',
+    'password': 'pgledger',
+    'host': 'localhost',
+    'port': 5432
+}
+
 
 def get_smbs_rates_xml(currency_code: str, start_date: str = None):
     """SMBS 환율 XML을 조회해서 날짜별 환율 리스트 반환"""
@@ -64,6 +77,18 @@ def save_to_json(data, filename="exchange_rates.json"):
     else:
         print("✅ No new records to save.")
 
+    return merged
+
+
+def save_to_db(data):
+    """수집된 전체 환율을 ledger_exchange_rates 테이블에 일괄 upsert 합니다."""
+    try:
+        with psycopg.connect(**DB_CONFIG) as conn:
+            changed = upsert_rates(conn, data)
+        print(f"✅ {changed} records upserted into ledger_exchange_rates")
+    except psycopg.Error as e:
+        print(f"⚠️ DB 동기화 실패 (JSON 파일은 저장됨): {e}")
+
 
 def main():
     KST = timezone(timedelta(hours=9))
@@ -89,7 +114,9 @@ def main():
         
         data[currency] = get_smbs_rates_xml(currency, start_date=start_date)
 
-    save_to_json(data, filename=filename)
+    merged = save_to_json(data, filename=filename)
+    # 기존 기록까지 포함해 upsert 하므로, DB가 비어 있거나 이전 동기화가 실패했어도 다시 맞춰짐
+    save_to_db(merged)
 
 
 if __name__ == "__main__":